@@ -13,9 +13,49 @@ ARTIFACT_HUNT_DURATION = 10
 TRADE_DURATION = 3
 LOOT_SELLING_THRESHOLD = 2000  # amount of "looted" value for squad to have to trigger selling
 
+"""Corpse parameters"""
+CORPSE_LIFETIME = 300  # corpses decay and are removed from the grid after this long (seconds)
+MAX_CORPSES = 1000  # max number of corpses on the grid, the oldest ones are removed first
+
 """Pathfinding parameters"""
-PATHFINDING_MODE = "hpa"  # simple, astar, diagonal-astar or hpa
+PATHFINDING_MODE = "hpa"  # simple, astar, diagonal-astar, hpa or auto (picks one per request)
 CLUSTER_SIZE = 10  # hpa only
+HPA_WARM_UP = "sync"  # sync blocks startup until HPA* data is computed, background starts right away with degraded routing
+WARMUP_NODE_BUDGET = 5000  # max A* expansions per path while HPA* data is warming up
+PATHFINDING_EXECUTOR = "inline"  # where async searches run: inline, thread or process pool, sliced (on the event loop in small steps)
+PATHFINDING_WORKERS = 4  # max number of async searches running at once
+PATHFINDING_TICK_BUDGET = 500  # sliced searches: nodes expanded per event loop iteration, shared by all searches
+PATHFINDING_SLICE = 100  # sliced searches: nodes expanded between budget checks
+AUTO_LOCAL_DISTANCE = 10  # auto mode: searches up to this distance always use 8-way A*
+AUTO_SAMPLES = 20  # auto mode: searches sampled per algorithm before picking one for medium distances
+ALT_LANDMARKS = 8  # landmarks for A* heuristics, distances from them are computed once per map. 0 disables them
+ALT_ACTIVE = 3  # landmarks used per search, the ones giving the best estimate at the start
+LANDMARK_CACHE_DIR = ".cache"  # landmark distances are cached here between runs, None disables caching
+PURSUIT_SLACK = 3  # hunted squads can move this far before the hunter's incremental search is rebuilt
+
+"""Level of detail parameters"""
+LOD_RADIUS = None  # squads farther than this from LOD_FOCUS travel and fight at cluster level (hpa mode only), None simulates everything square by square
+LOD_FOCUS = None  # square the observer is looking at, defaults to the grid center
+
+"""Sharding parameters"""
+SHARD_REGIONS = (1, 1)  # number of regions along X and Y axes. Each region runs in its own process, (1, 1) disables sharding
+BORDER_MARGIN = 5  # squads this close to a region border are visible to hunters in neighboring regions
+BORDER_SYNC_INTERVAL = 5  # how often border squads are published to neighboring regions (seconds)
+
+"""Reproducibility parameters"""
+SEED = None  # seed for per-subsystem random streams. Seeded runs use simulated time, so they are fully reproducible
+SIMULATION_SPEED = 1.0  # simulated time speed relative to real time in seeded runs and replays, None runs as fast as possible
+RECORD_FILE = None  # file to record simulation events to, i.e.: "alife.rec"
+REPLAY_FILE = None  # replay a recorded file instead of running the simulation
+
+"""Task engine parameters"""
+TASK_ENGINE = "asyncio"  # asyncio runs every task in its own coroutine, wheel steps all tasks from a single timer wheel
+ENGINE_RESOLUTION = 0.1  # timer wheel tick (seconds), task delays are rounded up to it
+
+"""Streaming parameters"""
+STREAM_PORT = None  # port to stream grid state to external viewers on, i.e.: 8765. None disables streaming
+STREAM_HOST = "127.0.0.1"
+STREAM_QUEUE_SIZE = 64  # max number of frames queued per client, slower clients are resynced with a fresh snapshot
 
 """Other parameters"""
 SHOW_GRID = True  # enables the map grid display in terminal (larger grids may not fit)
@@ -1,5 +1,14 @@
 from .actor import Actor
 from .squad import Squad
 from .grid import MapGrid
-from .pathfinder import Pathfinder
+from .corpses import CorpseRegistry
+from .pathfinder import Pathfinder, Pursuit
+from .path import Path
+from .lod import LevelOfDetail
 from .tasks import *
+from . import rng
+from .clock import VirtualClockEventLoop
+from .engine import TimerWheel, TaskEngine
+from .recorder import EventRecorder, EventReplayer
+from .sharding import Region, Partition, Shard, Coordinator
+from .streaming import StreamServer
@@ -1,7 +1,6 @@
-import random
-
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
+from library.rng import get_rng
 from library.types import Location
 from config import RANKS, EXP_PER_RANK, FACTIONS
 
@@ -14,18 +13,19 @@ class Actor:
     rank: str = RANKS[0]
     experience: int = 0
     loot_value: int = 0
+    grid_slot: int = field(default=-1, compare=False, repr=False)  # index in the grid square, maintained by MapGrid
 
     def __post_init__(self):
         """Set-up actor after creation"""
         if FACTIONS[self.faction]["can_gain_exp"]:
-            if not self.experience: self.gain_exp(random.randint(1, (len(RANKS) - 1) * EXP_PER_RANK))
+            if not self.experience: self.gain_exp(get_rng("actor").randint(1, (len(RANKS) - 1) * EXP_PER_RANK))
         else:
             # assume that actors that don't gain exp are "average" for combat purposes
             self.gain_exp(((len(RANKS) - 1) * EXP_PER_RANK) // 2)
 
         self.rank_up()
 
-        self.loot_value = self.experience // random.randint(10, 30)  # assume actor's loot value is proportional to his experience
+        self.loot_value = self.experience // get_rng("actor").randint(10, 30)  # assume actor's loot value is proportional to his experience
 
     def __str__(self):
         return f"{self.faction.capitalize()} actor ({self.rank}) at location {self.location}"
@@ -0,0 +1,62 @@
+import asyncio
+import selectors
+
+from typing import Optional
+
+
+class _VirtualTimeSelector(selectors.BaseSelector):
+    """
+        Wraps a real selector. Instead of blocking until the next scheduled timer, the virtual clock
+        is advanced by the requested timeout, optionally waiting a scaled amount of real time first
+    """
+
+    def __init__(self, loop: "VirtualClockEventLoop"):
+        self._loop = loop
+        self._selector = selectors.DefaultSelector()
+
+    def register(self, fileobj, events, data=None):
+        return self._selector.register(fileobj, events, data)
+
+    def unregister(self, fileobj):
+        return self._selector.unregister(fileobj)
+
+    def modify(self, fileobj, events, data=None):
+        return self._selector.modify(fileobj, events, data)
+
+    def get_map(self):
+        return self._selector.get_map()
+
+    def close(self):
+        self._selector.close()
+
+    def select(self, timeout=None):
+        # Nothing is scheduled, wait for outside events (i.e.: calls from other threads)
+        if timeout is None:
+            return self._selector.select(None)
+
+        speed = self._loop.speed
+        events = self._selector.select(timeout / speed if speed and timeout > 0 else 0)
+        if not events and timeout > 0:
+            self._loop.advance(timeout)
+
+        return events
+
+
+class VirtualClockEventLoop(asyncio.SelectorEventLoop):
+    """
+        Event loop running on simulated time. Timers fire in a strictly deterministic order and
+        the loop never waits for them in real time unless a speed is specified (1.0 being real time)
+    """
+
+    def __init__(self, speed: Optional[float] = None):
+        self.speed = speed
+        self._virtual_time = 0.0
+        super().__init__(selector=_VirtualTimeSelector(self))
+
+    def time(self):
+        return self._virtual_time
+
+    def advance(self, seconds: float):
+        self._virtual_time += seconds
+
+        return True
@@ -0,0 +1,92 @@
+import time
+
+from collections import deque
+from itertools import islice
+from typing import Callable
+
+from config import CORPSE_LIFETIME, MAX_CORPSES
+
+from library.actor import Actor
+from library.types import Location
+
+
+class CorpseRegistry:
+    """
+        Keeps track of corpses on the grid. Corpses decay after a while and the oldest ones are removed
+        once there are too many of them, lootable corpses are indexed per square for the task loop
+    """
+
+    def __init__(self, grid, lifetime: float = CORPSE_LIFETIME, limit: int = MAX_CORPSES, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock  # set to the event loop clock when running on simulated time
+        self._grid = grid
+        self._lifetime = lifetime
+        self._limit = limit
+        self._queue = deque()  # (time of death, corpse). Lifetime is the same for everyone, so it's also the expiry order
+        self._squares = {}  # id(corpse) -> square for corpses currently on the grid
+        self._lootable = {}  # square -> {id(corpse): corpse}, insertion ordered
+
+    def __len__(self):
+        return len(self._squares)
+
+    def add(self, actor: Actor, square: Location):
+        """Place a corpse on the grid"""
+        self._grid.place(actor, square)
+        self._squares[id(actor)] = square
+        self._queue.append((self.clock(), actor))
+
+        if actor.loot_value is not None:
+            self._lootable.setdefault(square, {})[id(actor)] = actor
+
+        # evict the oldest corpses, entries of already removed ones are skipped
+        while len(self._squares) > self._limit:
+            _, oldest = self._queue.popleft()
+            if id(oldest) in self._squares:
+                self.remove(oldest)
+
+        return True
+
+    def remove(self, actor: Actor):
+        """Remove a corpse from the grid, i.e.: once it's looted"""
+        square = self._squares.pop(id(actor), None)
+        if square is None:
+            # corpse was placed on the grid directly, or is already gone
+            return self._grid.remove(actor)
+
+        self._unindex(actor, square)
+        self._grid.remove(actor, square)
+
+        return True
+
+    def mark_looted(self, actor: Actor):
+        """Exclude a corpse from lootable ones. It stays on the grid until removed"""
+        square = self._squares.get(id(actor))
+        if square is None:
+            return False
+
+        self._unindex(actor, square)
+
+        return True
+
+    def _unindex(self, actor: Actor, square: Location):
+        lootable = self._lootable.get(square)
+        if lootable is not None and lootable.pop(id(actor), None) is not None and not lootable:
+            del self._lootable[square]
+
+    def count_lootable(self, square: Location):
+        return len(self._lootable.get(square, ()))
+
+    def get_lootable(self, square: Location, limit: int):
+        """Lootable corpses on a square, oldest first"""
+        return list(islice(self._lootable.get(square, {}).values(), limit))
+
+    def expire(self):
+        """Remove decayed corpses. Returns the number of corpses removed"""
+        deadline = self.clock() - self._lifetime
+        removed = 0
+        while self._queue and self._queue[0][0] <= deadline:
+            _, actor = self._queue.popleft()
+            if id(actor) in self._squares:
+                self.remove(actor)
+                removed += 1
+
+        return removed
@@ -0,0 +1,218 @@
+import asyncio
+import heapq
+import itertools
+import math
+
+from typing import Callable, Generator, Optional
+
+from config import ENGINE_RESOLUTION
+
+from library.tasks import Task
+
+
+class TimerWheel:
+    """
+        Hierarchical timing wheel. Timers are kept in buckets by tick, timers further away are kept in coarser
+        levels and cascade down as time passes. Timers beyond the last level wait in a heap
+    """
+
+    def __init__(self, resolution: float = ENGINE_RESOLUTION, start: float = 0.0, slot_bits: int = 6, levels: int = 3):
+        self.resolution = resolution
+        self._bits = slot_bits
+        self._mask = (1 << slot_bits) - 1
+        self._levels = [[[] for _ in range(1 << slot_bits)] for _ in range(levels)]
+        self._horizon = 1 << (slot_bits * levels)
+        self._overflow = []  # (tick, seq, item) for timers beyond the last level
+        self._seq = itertools.count()
+        self._tick = self.to_tick(start)  # every tick before this one was already processed
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def to_tick(self, when: float):
+        # tolerate float error, i.e. 0.30000000000000004 / 0.1
+        return math.ceil(when / self.resolution - 1e-9)
+
+    def schedule(self, item, when: float):
+        """Schedule an item at a given time. Returns the tick it will fire at"""
+        tick = max(self._tick, self.to_tick(when))
+        self._insert(tick, item)
+        self._size += 1
+
+        return tick
+
+    def _insert(self, tick: int, item):
+        delta = tick - self._tick
+        for level, buckets in enumerate(self._levels):
+            if delta < 1 << (self._bits * (level + 1)):
+                buckets[(tick >> (self._bits * level)) & self._mask].append((tick, item))
+                return
+
+        heapq.heappush(self._overflow, (tick, next(self._seq), item))
+
+    def _cascade(self, tick: int):
+        """Move timers from coarser levels down once the current tick reaches their range"""
+        if tick & ((self._horizon >> self._bits) - 1) == 0:
+            while self._overflow and self._overflow[0][0] - tick < self._horizon:
+                entry_tick, _, item = heapq.heappop(self._overflow)
+                self._insert(entry_tick, item)
+
+        for level in range(len(self._levels) - 1, 0, -1):
+            if tick & ((1 << (self._bits * level)) - 1):
+                continue
+
+            bucket_index = (tick >> (self._bits * level)) & self._mask
+            bucket = self._levels[level][bucket_index]
+            self._levels[level][bucket_index] = []
+            for entry_tick, item in bucket:
+                self._insert(entry_tick, item)
+
+    def current_tick(self, now: float):
+        return math.floor(now / self.resolution + 1e-9)
+
+    def skip(self, now: float):
+        """Jump over idle ticks up to a given time. Only possible when nothing is pending"""
+        if not self._size:
+            self._tick = max(self._tick, self.current_tick(now))
+
+        return True
+
+    def advance(self, target: int):
+        """Process all ticks up to a given one, returning due items in order"""
+        due = []
+        while self._tick <= target:
+            tick = self._tick
+            self._cascade(tick)
+
+            bucket_index = tick & self._mask
+            bucket = self._levels[0][bucket_index]
+            if bucket:
+                self._levels[0][bucket_index] = []
+                due.extend(item for _, item in bucket)
+
+            self._tick += 1
+
+        self._size -= len(due)
+
+        return due
+
+    def next_tick(self):
+        """Earliest tick that needs processing. When nothing is due soon it's the next cascade"""
+        if not self._size:
+            return None
+
+        buckets = self._levels[0]
+        for offset in range(self._mask + 1):
+            if buckets[(self._tick + offset) & self._mask]:
+                return self._tick + offset
+
+        return (self._tick | self._mask) + 1
+
+
+class _TaskRecord:
+    """State of a single running task. Current step is a generator paused at its last yield"""
+
+    __slots__ = ("steps", "step", "results", "on_done", "wake")
+
+    def __init__(self, steps: list[Generator], on_done: Optional[Callable]):
+        self.steps = steps
+        self.step = None
+        self.results = []
+        self.on_done = on_done
+        self.wake = None
+
+
+class TaskEngine:
+    """
+        Alternative to running every task in its own coroutine. Task steps are advanced by a single timer wheel
+        armed with one event loop timer, so idle squads cost a small record instead of a task, a coroutine,
+        a future and a timer handle each. Tasks keep their semantics, since both engines run the same steps
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, resolution: float = ENGINE_RESOLUTION):
+        self._loop = loop
+        self._wheel = TimerWheel(resolution, loop.time())
+        self._handle = None
+        self._armed_tick = None
+        self._dispatching = False
+        self._running = 0
+
+    def __len__(self):
+        """Number of tasks in progress"""
+        return self._running
+
+    def submit(self, task: Task, on_done: Optional[Callable] = None):
+        """Start a task. If provided, on_done is called with the list of step results once it's complete"""
+        record = _TaskRecord(task.get_steps(), on_done)
+        self._running += 1
+        self._resume(record, None, None)
+
+        return record
+
+    def _resume(self, record: _TaskRecord, result, error: Optional[BaseException]):
+        """Run task steps until one of them has to wait"""
+        while True:
+            if record.step is None:
+                if not record.steps:
+                    self._running -= 1
+                    if record.on_done is not None:
+                        record.on_done(record.results)
+                    return
+
+                record.step = record.steps.pop(0)
+
+            try:
+                request = record.step.send(result) if error is None else record.step.throw(error)
+            except StopIteration as e:
+                record.results.append(e.value)
+                record.step, result, error = None, None, None
+                continue
+            except Exception as e:
+                self._running -= 1
+                self._loop.call_exception_handler({"message": "Task step failed", "exception": e})
+                return
+
+            if isinstance(request, (int, float)):
+                self._schedule(record, self._loop.time() + request)
+            else:
+                request.add_done_callback(lambda future: self._on_future(record, future))
+
+            return
+
+    def _on_future(self, record: _TaskRecord, future: asyncio.Future):
+        if future.cancelled():
+            self._resume(record, None, asyncio.CancelledError())
+        elif future.exception() is not None:
+            self._resume(record, None, future.exception())
+        else:
+            self._resume(record, future.result(), None)
+
+    def _schedule(self, record: _TaskRecord, when: float):
+        self._wheel.skip(self._loop.time())  # don't walk through idle time tick by tick
+        record.wake = self._wheel.schedule(record, when)
+        if not self._dispatching and (self._armed_tick is None or record.wake < self._armed_tick):
+            self._arm(record.wake)
+
+    def _arm(self, tick: Optional[int]):
+        """Keep exactly one event loop timer, set to the next tick that needs processing"""
+        if self._handle is not None:
+            self._handle.cancel()
+
+        self._handle, self._armed_tick = None, tick
+        if tick is not None:
+            self._handle = self._loop.call_at(tick * self._wheel.resolution, self._on_timer)
+
+    def _on_timer(self):
+        # event loop timers can fire slightly early, the armed tick is due regardless
+        target = max(self._armed_tick, self._wheel.current_tick(self._loop.time()))
+        self._handle, self._armed_tick = None, None
+
+        self._dispatching = True
+        try:
+            for record in self._wheel.advance(target):
+                self._resume(record, None, None)
+        finally:
+            self._dispatching = False
+
+        self._arm(self._wheel.next_tick())
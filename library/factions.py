@@ -0,0 +1,22 @@
+from config import FACTIONS
+
+# Factions are numbered in config order, hostility is kept as a bitmask per faction
+FACTION_INDEX = {faction: i for i, faction in enumerate(FACTIONS)}
+HOSTILITY = [sum(1 << FACTION_INDEX[h] for h in FACTIONS[f]["hostile"] if h in FACTION_INDEX) for f in FACTIONS]
+
+
+def faction_bit(faction: str):
+    return 1 << FACTION_INDEX[faction]
+
+
+def hostile_mask(faction: str):
+    """Bitmask of factions hostile to a given faction"""
+    return HOSTILITY[FACTION_INDEX[faction]]
+
+
+def iter_bits(mask: int):
+    """Faction indices set in a bitmask, lowest first"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
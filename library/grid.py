@@ -2,25 +2,37 @@ import os
 import pickle
 import random
 
-from collections import deque, defaultdict
+from array import array
+
+from collections import deque
 from colorama import Fore, just_fix_windows_console
-from typing import Optional
+from typing import Callable, Optional
 
 from library.actor import Actor
+from library.corpses import CorpseRegistry
+from library.factions import FACTION_INDEX, HOSTILITY, iter_bits
+from library.lod import LevelOfDetail
 from library.pathfinder import Pathfinder
+from library.rng import get_rng
 from library.squad import Squad
 from library.types import Location
 
-from config import MAX_NUM_MESSAGES, SHOW_GRID, GRID_X_SIZE, GRID_Y_SIZE, MAP, FACTIONS
+from config import MAX_NUM_MESSAGES, SHOW_GRID, GRID_X_SIZE, GRID_Y_SIZE, MAP, FACTIONS, HPA_WARM_UP, LOD_RADIUS
 
 
 class MapGrid:
     """Defines the map and contains all map-related function"""
 
     def __init__(self):
-        self._grid = defaultdict(lambda: ([], []))
+        self._grid = {}  # square -> (squads, actors), only occupied squares are kept
         self._msg_log = deque([], maxlen=MAX_NUM_MESSAGES)
-        self._squares_to_delete = set()
+        self._dirty_squares = set()  # squares whose occupancy has changed since the last task loop pass
+        self._squads = {}  # sid -> squad index for squads currently on the grid
+        self._buckets = {}  # square -> {faction index -> squads}, used for hostile squad pairing
+        self._faction_masks = {}  # square -> bitmask of factions present
+        self.shard = None  # region state when running in sharded mode
+        self._listeners = []  # callbacks receiving grid events, i.e.: recorders
+        self.corpses = CorpseRegistry(self)
 
         dirname = os.path.dirname(__file__)
         mapfile = os.path.abspath(os.path.join(dirname, f'../maps/{MAP}'))
@@ -39,7 +51,24 @@ class MapGrid:
             area_map = {"pois": set(), "fields": set(), "traders": set(), "obstacles": set()}
 
         self._area_map = area_map
-        self.pathfinder = Pathfinder(area_map["obstacles"])
+        self.pathfinder = Pathfinder(
+            area_map["obstacles"],
+            background=HPA_WARM_UP == "background",
+            on_ready=lambda pathfinder: self.add_log_msg("INFO", f" Pathfinding data is ready ({pathfinder.warmup_time:.2f} seconds)"),
+            landmarks=[*area_map["traders"], *area_map["fields"]]
+        )
+
+        # Squads away from the observer are simulated at cluster level
+        self.lod = None
+        if LOD_RADIUS is not None:
+            self.lod = LevelOfDetail(self.pathfinder, LOD_RADIUS)
+            self.add_listener(self.lod)
+
+        # Walkable squares as linear indices (y * GRID_X_SIZE + x), for the whole map and faction spawn areas
+        self._free_cells = {None: self._get_free_cells(0, 0, GRID_X_SIZE, GRID_Y_SIZE)}
+        for faction, params in FACTIONS.items():
+            if params["spawn_bias"] is not None:
+                self._free_cells[faction] = self._get_free_cells(*self.get_spawn_area(params["spawn_bias"]))
 
         # Fix colored display on Windows
         just_fix_windows_console()
@@ -50,6 +79,98 @@ class MapGrid:
     def get_obstacles(self):
         return self._area_map["obstacles"]
 
+    def add_listener(self, listener: Callable):
+        """Subscribe to grid events. Listener is called with the event type followed by event-specific arguments"""
+        self._listeners.append(listener)
+
+        return True
+
+    def remove_listener(self, listener: Callable):
+        try:
+            self._listeners.remove(listener)
+        except ValueError:
+            return False
+
+        return True
+
+    def emit(self, event: str, *args):
+        """Notify listeners about a grid event (i.e.: place, remove, spawn, death, task, combat, log)"""
+        for listener in self._listeners:
+            listener(event, *args)
+
+        return True
+
+    def mark_dirty(self, square: Location):
+        """Queue a square for the task loop to make decisions for squads on it"""
+        self._dirty_squares.add(square)
+
+        return True
+
+    def pop_dirty_squares(self):
+        dirty = self._dirty_squares
+        self._dirty_squares = set()
+
+        return dirty
+
+    def get_hostile_pair(self, square: Location):
+        """
+            Find two hostile squads on a square that are able to fight. Factions present on the square
+            are matched against hostility bitmasks, so only squads of hostile factions are ever looked at
+        """
+        mask = self._faction_masks.get(square, 0)
+        for faction in iter_bits(mask):
+            hostile = mask & HOSTILITY[faction]
+            if not hostile:
+                continue
+
+            buckets = self._buckets[square]
+            left = next((s for s in buckets[faction].values() if s.actors and not s.in_combat), None)
+            if left is None:
+                continue
+
+            for other in iter_bits(hostile):
+                right = next((s for s in buckets[other].values() if s is not left and s.actors and not s.in_combat), None)
+                if right is not None:
+                    return left, right
+
+        return None
+
+    def owns(self, square: Location):
+        """Check if a square is simulated by this grid. Always true unless running in sharded mode"""
+        return self.shard is None or self.shard.owns(square)
+
+    def find_squad(self, sid: str):
+        return self._squads.get(sid)
+
+    def hand_off(self, squad: Squad, square: Location, resume: Optional[tuple] = None):
+        """Move squad to a square owned by another region. Resume describes the task to continue there, if any"""
+        self.remove(squad)
+
+        squad.location = square
+        for actor in squad.actors:
+            actor.location = square
+
+        self.shard.hand_off(squad, resume)
+
+        return True
+
+    def _get_free_cells(self, lower_x: int, lower_y: int, upper_x: int, upper_y: int):
+        obstacles = self._area_map["obstacles"]
+        return array("I", (
+            y * GRID_X_SIZE + x
+            for y in range(lower_y, upper_y) for x in range(lower_x, upper_x) if (x, y) not in obstacles
+        ))
+
+    def get_random_cell(self, rng: random.Random = random, faction: Optional[str] = None):
+        """Random walkable square, within the faction spawn area if one is provided"""
+        cells = self._free_cells.get(faction) or self._free_cells[None]
+        if not cells:
+            return None
+
+        y, x = divmod(cells[rng.randrange(len(cells))], GRID_X_SIZE)
+
+        return x, y
+
     def get_closest_of_type(self, t: str, point: Location):
         """Return the closest coordinate of a given entity(i.e.: trader, field, poi) relative to a given position"""
         closest = sorted(self._area_map[t], key=lambda x: self.pathfinder.manhattan_distance(point, x))
@@ -66,10 +187,15 @@ class MapGrid:
         candidates = []
         for x in range(low_x, high_x):
             for y in range(low_y, high_y):
-                if self._grid.get((x, y)):
-                    squadlist = self._grid[(x, y)][0]
+                if cell := self._grid.get((x, y)):
+                    squadlist = cell[0]
                     candidates.extend([squad for squad in squadlist if squad.faction in factions and squad.num_actors() <= max_actors])
 
+        # Squads across the region border are published by the neighbors
+        if self.shard is not None:
+            ghosts = self.shard.get_ghosts(low_x, high_x, low_y, high_y)
+            candidates.extend([squad for squad in ghosts if squad.faction in factions and squad.num_actors() <= max_actors])
+
         if not candidates:
             return False
 
@@ -123,7 +249,7 @@ class MapGrid:
 
     def refresh(self):
         """Redraw the grid in the terminal"""
-        if not SHOW_GRID:
+        if not SHOW_GRID or self.shard is not None:
             return False
 
         os.system("cls" if os.name == "nt" else "printf '\033c\033[3J'")
@@ -132,6 +258,8 @@ class MapGrid:
     def add_log_msg(self, msg_type: str, message: str, square: Optional[Location] = None):
         """Logging helper"""
 
+        self.emit("log", msg_type, message, square)
+
         parts = []
         color_map = {
             "CMBT": Fore.RED,
@@ -147,13 +275,16 @@ class MapGrid:
         if color := color_map.get(msg_type):
             parts.append(f"{color}[{msg_type}]{Fore.RESET}")
 
+        if self.shard is not None:
+            parts.append(f"[REGION={self.shard.region.rid}]")
+
         if square:
             parts.append(f"[SQUARE={square}]")
 
         parts.append(message.upper())
         logged_msg = " ".join(parts)
 
-        if SHOW_GRID:
+        if SHOW_GRID and self.shard is None:
             self._msg_log.append(logged_msg)
         else:
             print(logged_msg)
@@ -164,23 +295,25 @@ class MapGrid:
         """Spawn random faction squad on the map"""
 
         if location is None:
-            bias = FACTIONS[faction]["spawn_bias"]
-            lower_x, lower_y, upper_x, upper_y = (0, 0, GRID_X_SIZE, GRID_Y_SIZE)
-
-            if bias is not None:
-                lower_x, lower_y, upper_x, upper_y = self.get_spawn_area(FACTIONS[faction]["spawn_bias"])
-
-            # avoid spawning on top of obstacles
-            while (location := (random.randint(lower_x, upper_x), random.randint(lower_y, upper_y))) in self._area_map["obstacles"]: pass
+            # spawn area falls back to the whole map for unbiased factions
+            location = self.get_random_cell(get_rng("spawn"), faction)
+            if location is None:
+                self.add_log_msg("INFO", f" No free squares to spawn a {faction.upper()} squad")
+                return False
 
         squad = Squad(faction, location)
         # Generate actors
-        num_actors = random.randint(1, 5)
+        num_actors = get_rng("spawn").randint(1, 5)
         for _ in range(num_actors):
             actor = Actor(faction, location)
             squad.add_actor(actor)
 
-        self.place(squad, location)
+        if self.owns(location):
+            self.place(squad, location)
+        else:
+            self.shard.hand_off(squad)
+
+        self.emit("spawn", squad)
         self.add_log_msg("INFO", f"Spawned a new {num_actors}-actor {faction.upper()} squad", location)
 
         return True
@@ -222,31 +355,96 @@ class MapGrid:
 
     def remove(self, entity: type[Actor | Squad], square: Optional[Location] = None):
         """Remove actor or squad from the grid. If grid square is not provided - attempt to get location from the entity"""
-        index = 0 if isinstance(entity, Squad) else 1
-        try:
-            location = square if square is not None else entity.location
-            del self._grid[location][index][self._grid[location][index].index(entity)]
-        except (KeyError, ValueError):
+        location = square if square is not None else entity.location
+        if not self._detach(entity, location):
             return False
 
-        # Query empty square cleanup
-        if not list(filter(bool, self._grid[location])):
-            self._squares_to_delete.add(location)
+        self._dirty_squares.add(location)
+        self.emit("remove", entity, location)
 
         return True
 
     def place(self, entity: type[Actor | Squad], square: Location):
         """Place actor or squad on the grid square"""
-        index = 0 if isinstance(entity, Squad) else 1
-        self._grid[square][index].append(entity)
+        self._attach(entity, square)
+
+        self._dirty_squares.add(square)
+        self.emit("place", entity, square)
 
         return True
 
-    def cleanup(self):
-        """Clean up empty squares. On larger grids they take up a lot of memory"""
-        for square in self._squares_to_delete:
+    def move(self, entity: type[Actor | Squad], source: Location, dest: Location):
+        """Move an entity between squares, updating its location. Entities that are not on the grid yet are placed"""
+        if self._detach(entity, source):
+            self._dirty_squares.add(source)
+            self.emit("remove", entity, source)
+
+        self._attach(entity, dest)
+        entity.location = dest
+
+        self._dirty_squares.add(dest)
+        self.emit("place", entity, dest)
+
+        return True
+
+    def _attach(self, entity: type[Actor | Squad], square: Location):
+        index = 0 if isinstance(entity, Squad) else 1
+        cell = self._grid.get(square)
+        if cell is None:
+            cell = self._grid[square] = ([], [])
+
+        entity.grid_slot = len(cell[index])
+        cell[index].append(entity)
+
+        if index == 0:
+            self._squads[entity.sid] = entity
+
+            faction = FACTION_INDEX[entity.faction]
+            self._buckets.setdefault(square, {}).setdefault(faction, {})[entity.sid] = entity
+            self._faction_masks[square] = self._faction_masks.get(square, 0) | 1 << faction
+
+    def _detach(self, entity: type[Actor | Squad], square: Location):
+        """
+            Swap-remove an entity from its square using the slot index stored on it. Empty squares are
+            removed right away, on larger grids they take up a lot of memory
+        """
+        index = 0 if isinstance(entity, Squad) else 1
+        cell = self._grid.get(square)
+        if cell is None:
+            return False
+
+        entities = cell[index]
+        slot = entity.grid_slot
+        if not 0 <= slot < len(entities) or entities[slot] is not entity:
+            return False
+
+        last = entities.pop()
+        if last is not entity:
+            entities[slot] = last
+            last.grid_slot = slot
+        entity.grid_slot = -1
+
+        if index == 0:
+            self._squads.pop(entity.sid, None)
+
+            faction = FACTION_INDEX[entity.faction]
+            bucket = self._buckets[square][faction]
+            del bucket[entity.sid]
+            if not bucket:
+                del self._buckets[square][faction]
+                self._faction_masks[square] ^= 1 << faction
+                if not self._faction_masks[square]:
+                    del self._faction_masks[square], self._buckets[square]
+
+        if not cell[0] and not cell[1]:
             del self._grid[square]
 
-        self._squares_to_delete = set()
+        return True
+
+    def kill(self, squad: Squad, actor: Actor):
+        """Remove actor from the squad, leaving a corpse at the squad location for future looting"""
+        squad.remove_actor(actor)
+        self.emit("death", squad, actor, squad.location)
+        self.corpses.add(actor, squad.location)
 
         return True
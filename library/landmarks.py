@@ -0,0 +1,114 @@
+import hashlib
+import heapq
+import os
+import pickle
+
+from array import array
+from typing import Iterable, Optional
+
+from config import GRID_X_SIZE, GRID_Y_SIZE, ALT_ACTIVE, LANDMARK_CACHE_DIR
+
+from library.types import Location
+
+INF = float("inf")
+
+
+class Landmarks:
+    """
+        ALT heuristic for A* on static maps. Exact distances from a few landmark squares are computed once per map
+        (and cached on disk). By the triangle inequality |d(L, goal) - d(L, n)| never overestimates the distance
+        from n to the goal, and unlike straight-line estimates it knows about obstacles in between
+    """
+
+    def __init__(self, obstacles: set[Location], candidates: Iterable[Location], count: int, diagonal: bool = True,
+                 cache_dir: Optional[str] = LANDMARK_CACHE_DIR):
+        self.diagonal = diagonal
+        self.squares = self._pick(obstacles, candidates, count)
+
+        path = None
+        if cache_dir is not None:
+            digest = hashlib.sha1(repr((GRID_X_SIZE, GRID_Y_SIZE, diagonal, self.squares, sorted(obstacles))).encode()).hexdigest()
+            cache_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", cache_dir))  # relative to the project
+            path = os.path.join(cache_dir, f"landmarks-{digest[:16]}.bin")
+
+        if path is not None and os.path.exists(path):
+            with open(path, "rb") as f:
+                self._tables = [array("f", table) for table in pickle.load(f)]
+        else:
+            self._tables = [self._distances(obstacles, square) for square in self.squares]
+            if path is not None:
+                os.makedirs(cache_dir, exist_ok=True)
+                with open(path, "wb") as f:
+                    pickle.dump([table.tobytes() for table in self._tables], f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _pick(obstacles: set[Location], candidates: Iterable[Location], count: int):
+        """Spread landmarks out: greedily take the candidate farthest from the ones already picked"""
+        corners = []
+        for cx, cy in ((0, 0), (GRID_X_SIZE - 1, 0), (0, GRID_Y_SIZE - 1), (GRID_X_SIZE - 1, GRID_Y_SIZE - 1)):
+            # walkable square closest to a map corner, searched along anti-diagonals
+            corner = next(((x, y) for r in range(GRID_X_SIZE + GRID_Y_SIZE) for i in range(r + 1)
+                           if 0 <= (x := abs(cx - i)) < GRID_X_SIZE and 0 <= (y := abs(cy - (r - i))) < GRID_Y_SIZE
+                           and (x, y) not in obstacles), None)
+            if corner is not None:
+                corners.append(corner)
+
+        pool = list(dict.fromkeys(corners + [c for c in candidates if c not in obstacles]))
+        picked = pool[:1]
+        while pool and len(picked) < count:
+            best = max(pool, key=lambda c: min(max(abs(c[0] - p[0]), abs(c[1] - p[1])) for p in picked))
+            if best in picked:
+                break
+            picked.append(best)
+
+        return picked
+
+    def _distances(self, obstacles: set[Location], source: Location):
+        """Dijkstra from a landmark with the same step costs as the A* searches"""
+        table = array("f", [INF]) * (GRID_X_SIZE * GRID_Y_SIZE)
+        steps = [(0, 1, 1.0), (1, 0, 1.0), (0, -1, 1.0), (-1, 0, 1.0)]
+        if self.diagonal:
+            steps += [(1, 1, 1.4142), (1, -1, 1.4142), (-1, -1, 1.4142), (-1, 1, 1.4142)]
+
+        table[source[1] * GRID_X_SIZE + source[0]] = 0
+        heap = [(0.0, source)]
+        while heap:
+            d, (x, y) = heapq.heappop(heap)
+            if d > table[y * GRID_X_SIZE + x]:
+                continue
+
+            for dx, dy, cost in steps:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < GRID_X_SIZE and 0 <= ny < GRID_Y_SIZE and (nx, ny) not in obstacles:
+                    nd = d + cost
+                    i = ny * GRID_X_SIZE + nx
+                    if nd < table[i]:
+                        table[i] = nd
+                        heapq.heappush(heap, (nd, (nx, ny)))
+
+        return table
+
+    def heuristic(self, start: Location, goal: Location):
+        """
+            Lower bound of the distance to goal as a function of a square. Only ALT_ACTIVE landmarks giving
+            the best bound for the start square are used, which keeps heuristic evaluation cheap
+        """
+        s, g = start[1] * GRID_X_SIZE + start[0], goal[1] * GRID_X_SIZE + goal[0]
+        reachable = [table for table in self._tables if table[g] != INF and table[s] != INF]
+        reachable.sort(key=lambda table: abs(table[g] - table[s]), reverse=True)
+        active = [(table, table[g]) for table in reachable[:ALT_ACTIVE]]
+        width = GRID_X_SIZE
+
+        def bound(square: Location):
+            i = square[1] * width + square[0]
+            best = 0.0
+            for table, to_goal in active:
+                d = to_goal - table[i]
+                if d < 0:
+                    d = -d
+                if d > best:
+                    best = d
+
+            return best
+
+        return bound
@@ -0,0 +1,65 @@
+from typing import Optional
+
+from config import GRID_X_SIZE, GRID_Y_SIZE, CLUSTER_SIZE, LOD_FOCUS
+
+from library.factions import FACTION_INDEX, HOSTILITY
+from library.pathfinder import Pathfinder
+from library.squad import Squad
+from library.types import Location
+
+
+class LevelOfDetail:
+    """
+        Offline A-Life. Squads farther than radius squares from the focus point (i.e.: where the observer is looking)
+        are simulated coarsely: they travel cluster to cluster on the HPA* cluster graph and fight statistically
+        resolved encounters with hostile squads in the same cluster instead of per-square combat.
+        Squads are indexed per cluster from grid events, subscribe it to the grid with MapGrid.add_listener
+    """
+
+    def __init__(self, pathfinder: Pathfinder, radius: int, focus: Optional[Location] = None):
+        self.radius = radius
+        self.focus = focus or LOD_FOCUS or (GRID_X_SIZE // 2, GRID_Y_SIZE // 2)  # can be moved around while running
+        self._pathfinder = pathfinder
+        self._clusters = {}  # cluster -> {sid: squad} for squads on the grid
+        self.hops = 0  # cluster to cluster moves made by offline squads
+        self.encounters = 0
+
+    def __call__(self, event: str, *args):
+        if event == "place" and isinstance(args[0], Squad):
+            self._clusters.setdefault(self.cluster_of(args[1]), {})[args[0].sid] = args[0]
+        elif event == "remove" and isinstance(args[0], Squad):
+            squads = self._clusters.get(self.cluster_of(args[1]))
+            if squads is not None and squads.pop(args[0].sid, None) is not None and not squads:
+                del self._clusters[self.cluster_of(args[1])]
+
+    @staticmethod
+    def cluster_of(square: Location):
+        return square[0] // CLUSTER_SIZE, square[1] // CLUSTER_SIZE
+
+    def is_online(self, square: Location):
+        """Check if a square is close enough to the focus point to be simulated square by square"""
+        return max(abs(square[0] - self.focus[0]), abs(square[1] - self.focus[1])) <= self.radius
+
+    def route(self, start: Location, dest: Location):
+        """
+            Squares an offline squad stops at on its way to dest, one per cluster: the walkable square closest
+            to the cluster center, dest itself for the last one. None if there's no cluster-level route
+        """
+        clusters = self._pathfinder.route_clusters(start, dest)
+        if clusters is None:
+            return None
+
+        squares = [self._pathfinder.cluster_anchor(cluster) for cluster in clusters[1:-1]]
+        if None in squares:
+            return None
+
+        return squares + [dest]
+
+    def find_rival(self, squad: Squad):
+        """Hostile offline squad in the same cluster that is able to fight"""
+        hostile = HOSTILITY[FACTION_INDEX[squad.faction]]
+        for other in self._clusters.get(self.cluster_of(squad.location), {}).values():
+            if (hostile >> FACTION_INDEX[other.faction]) & 1 and other.actors and not other.in_combat and not self.is_online(other.location):
+                return other
+
+        return None
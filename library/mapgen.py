@@ -0,0 +1,166 @@
+"""
+    Procedural map generator. Obstacles are thresholded value noise, walkable areas not connected to the largest one
+    are filled in, so every walkable square can be reached from any other. Everything is vectorized with numpy,
+    generating a 4000x4000 map takes seconds. Usage:
+
+        python -m library.mapgen 1000 857 --density 0.3 --scale 24 --output maps/generated_map_1000x857
+"""
+import argparse
+import pickle
+import time
+
+from typing import Optional
+
+import numpy as np
+
+
+def value_noise(width: int, height: int, scale: float, octaves: int, rng: np.random.Generator):
+    """Smoothly interpolated random lattice values, octaves add finer detail at half the scale and amplitude"""
+    noise = np.zeros((height, width), dtype=np.float32)
+    amplitude = 1.0
+    for _ in range(octaves):
+        scale = max(scale, 1.0)
+        lattice = rng.random((int(height / scale) + 2, int(width / scale) + 2), dtype=np.float32)
+
+        ys = np.arange(height, dtype=np.float32) / scale
+        xs = np.arange(width, dtype=np.float32) / scale
+        y0, x0 = ys.astype(np.int32), xs.astype(np.int32)
+        # smoothstep to avoid visible lattice lines
+        ty = (ys - y0) ** 2 * (3 - 2 * (ys - y0))
+        tx = (xs - x0) ** 2 * (3 - 2 * (xs - x0))
+
+        top = lattice[y0][:, x0] * (1 - tx) + lattice[y0][:, x0 + 1] * tx
+        bottom = lattice[y0 + 1][:, x0] * (1 - tx) + lattice[y0 + 1][:, x0 + 1] * tx
+        noise += amplitude * (top * (1 - ty)[:, None] + bottom * ty[:, None])
+
+        scale /= 2
+        amplitude /= 2
+
+    return noise
+
+
+def _runs(walkable: np.ndarray):
+    """Horizontal runs of walkable squares as (rows, starts, ends) arrays, ends are exclusive"""
+    height, width = walkable.shape
+    padded = np.zeros((height, width + 2), dtype=np.int8)
+    padded[:, 1:-1] = walkable
+    edges = np.diff(padded, axis=1)
+
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+
+    return rows, starts, ends
+
+
+def _components(rows: np.ndarray, starts: np.ndarray, ends: np.ndarray, width: int):
+    """
+        Label 4-connected components of runs. Runs in adjacent rows are linked if they overlap,
+        links are merged by alternating hooking and pointer jumping until labels stop changing
+    """
+    stride = width + 1
+    start_keys = rows * stride + starts
+    end_keys = rows * stride + ends
+
+    # runs of the next row overlapping a run form a contiguous range of indices
+    first = np.searchsorted(end_keys, (rows + 1) * stride + starts, side="right")
+    last = np.searchsorted(start_keys, (rows + 1) * stride + ends, side="left")
+    counts = np.maximum(last - first, 0)
+
+    left = np.repeat(np.arange(len(rows)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    right = np.repeat(first, counts) + offsets
+
+    labels = np.arange(len(rows))
+    while True:
+        a, b = labels[left], labels[right]
+        low, high = np.minimum(a, b), np.maximum(a, b)
+        linked = low != high
+        if not linked.any():
+            break
+
+        np.minimum.at(labels, high[linked], low[linked])
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+
+    return labels
+
+
+def _paint(shape: tuple[int, int], rows: np.ndarray, starts: np.ndarray, ends: np.ndarray):
+    """Boolean mask of squares covered by runs"""
+    delta = np.zeros((shape[0], shape[1] + 1), dtype=np.int32)
+    np.add.at(delta, (rows, starts), 1)
+    np.add.at(delta, (rows, ends), -1)
+
+    return np.cumsum(delta, axis=1)[:, :-1] > 0
+
+
+def generate_map(
+    width: int, height: int,
+    density: float = 0.3, scale: float = 16, octaves: int = 2,
+    pois: int = 10, fields: int = 5, traders: int = 3, seed: Optional[int] = None
+):
+    """
+        Generate a map in the format loaded by MapGrid. Density is the share of obstacle squares before
+        unreachable areas are filled in, scale is the typical size of obstacle clusters in squares
+    """
+    rng = np.random.default_rng(seed)
+
+    noise = value_noise(width, height, scale, octaves, rng)
+    walkable = noise >= np.quantile(noise, density)
+
+    # Keep only the largest connected walkable area
+    rows, starts, ends = _runs(walkable)
+    if len(rows):
+        labels = _components(rows, starts, ends, width)
+        sizes = np.bincount(labels, weights=ends - starts)
+        unreachable = labels != np.argmax(sizes)
+        walkable &= ~_paint(walkable.shape, rows[unreachable], starts[unreachable], ends[unreachable])
+
+    # Points of interest are placed on distinct walkable squares
+    free = np.flatnonzero(walkable)
+    picked = rng.choice(free, size=min(len(free), pois + fields + traders), replace=False)
+    points = [(int(i % width), int(i // width)) for i in picked]
+
+    ys, xs = np.nonzero(~walkable)
+
+    return {
+        "pois": points[:pois],
+        "fields": points[pois:pois + fields],
+        "traders": points[pois + fields:],
+        "obstacles": set(zip(xs.tolist(), ys.tolist()))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a random map with a fully connected walkable area")
+    parser.add_argument("width", type=int)
+    parser.add_argument("height", type=int)
+    parser.add_argument("--density", type=float, default=0.3, help="share of obstacle squares (0.0 - 1.0)")
+    parser.add_argument("--scale", type=float, default=16, help="typical obstacle cluster size (squares)")
+    parser.add_argument("--octaves", type=int, default=2, help="noise detail levels")
+    parser.add_argument("--pois", type=int, default=10)
+    parser.add_argument("--fields", type=int, default=5)
+    parser.add_argument("--traders", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", default=None, help="defaults to maps/generated_map_<width>x<height>")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    area_map = generate_map(
+        args.width, args.height, args.density, args.scale, args.octaves, args.pois, args.fields, args.traders, args.seed
+    )
+
+    output = args.output or f"maps/generated_map_{args.width}x{args.height}"
+    with open(output, "wb") as f:
+        pickle.dump(area_map, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    print(f"[INFO] Generated a {args.width}x{args.height} map with {len(area_map["obstacles"])} obstacles "
+          f"in {time.perf_counter() - started:.2f} seconds: {output}")
+    print(f"[INFO] Set MAP = \"{output.split("/")[-1]}\", GRID_X_SIZE = {args.width} and GRID_Y_SIZE = {args.height} in config.py to use it")
+
+
+if __name__ == "__main__":
+    main()
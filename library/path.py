@@ -0,0 +1,64 @@
+from array import array
+from typing import Iterable
+
+from library.types import Location
+
+
+class Path:
+    """
+        Compact path for squads on the move. Steps are run-length encoded as (dx, dy, count) triples,
+        so straight stretches of a long path take 12 bytes total. Squares are expanded one at a time
+    """
+
+    __slots__ = ("_runs", "_run", "_left", "_remaining", "_location")
+
+    def __init__(self, start: Location, squares: Iterable[Location]):
+        runs = array("i")
+        x, y = start
+        remaining = 0
+        for nx, ny in squares:
+            dx, dy = nx - x, ny - y
+            if runs and runs[-3] == dx and runs[-2] == dy:
+                runs[-1] += 1
+            else:
+                runs.extend((dx, dy, 1))
+
+            x, y = nx, ny
+            remaining += 1
+
+        self._runs = runs
+        self._run = 0  # index of the current run
+        self._left = runs[2] if runs else 0  # steps left in the current run
+        self._remaining = remaining
+        self._location = start  # last square handed out
+
+    def __len__(self):
+        return self._remaining
+
+    def __iter__(self):
+        """Remaining squares, without consuming them"""
+        runs = self._runs
+        x, y = self._location
+        left = self._left
+        for i in range(self._run * 3, len(runs), 3):
+            dx, dy = runs[i], runs[i + 1]
+            for _ in range(left):
+                x, y = x + dx, y + dy
+                yield x, y
+
+            left = runs[i + 5] if i + 5 < len(runs) else 0
+
+    def pop(self):
+        """Next square of the path"""
+        if not self._remaining:
+            raise IndexError("pop from an empty path")
+
+        i = self._run * 3
+        self._location = (self._location[0] + self._runs[i], self._location[1] + self._runs[i + 1])
+        self._remaining -= 1
+        self._left -= 1
+        if not self._left and self._remaining:
+            self._run += 1
+            self._left = self._runs[i + 5]
+
+        return self._location
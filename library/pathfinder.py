@@ -1,9 +1,19 @@
+import asyncio
 import heapq
+import itertools
+import math
+import threading
+import time
 
-from collections import defaultdict
-from typing import Optional
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Generator, Iterable, Optional
 
-from config import GRID_X_SIZE, GRID_Y_SIZE, PATHFINDING_MODE, CLUSTER_SIZE
+from config import GRID_X_SIZE, GRID_Y_SIZE, PATHFINDING_MODE, CLUSTER_SIZE, PURSUIT_SLACK, WARMUP_NODE_BUDGET
+from config import PATHFINDING_EXECUTOR, PATHFINDING_WORKERS, PATHFINDING_TICK_BUDGET, PATHFINDING_SLICE
+from config import AUTO_LOCAL_DISTANCE, AUTO_SAMPLES, ALT_LANDMARKS, LANDMARK_CACHE_DIR
+
+from library.landmarks import Landmarks
 
 from library.types import Location
 
@@ -11,7 +21,10 @@ from library.types import Location
 class Pathfinder:
     """Everything related to finding a path on the grid"""
 
-    def __init__(self, obstacles: set[Location]):
+    def __init__(
+        self, obstacles: set[Location], background: bool = False, on_ready: Optional[Callable[["Pathfinder"], None]] = None,
+        landmarks: Iterable[Location] = ()
+    ):
 
         # Cache computed path chunks for faster pathfinding
         self._path_cache = {}
@@ -20,16 +33,62 @@ class Pathfinder:
             (0, -1), (-1, -1), (-1, 0), (-1, 1)
         ]
         self._obstacles = obstacles
-
-        if PATHFINDING_MODE == "hpa":
+        self._anchors = {}  # cluster -> walkable square closest to its center
+        self._landmark_candidates = list(landmarks)  # i.e.: traders and fields, map corners are always considered
+        self._alt = None  # landmark distances for A* heuristics, see Landmarks
+
+        # Readiness of full-quality routing. Until then paths are searched with a budget and can be partial
+        self.ready = threading.Event()
+        self.warmup_time = None
+        self.degraded_paths = 0
+
+        # Work done by searches, nodes expanded by A* and HPA* cluster searches
+        self.expanded_nodes = 0
+        # Auto mode: calls, nodes expanded and path squares per strategy, see _iter_auto_path
+        self.strategy_stats = {s: {"calls": 0, "nodes": 0, "squares": 0} for s in ("direct", "local", "hpa", "budgeted")}
+        self._medium_stats = {"local": [0, 0, 0], "hpa": [0, 0, 0]}  # medium distance samples, calls, nodes and squares
+
+        # Off-loop searches, see create_path_async
+        self._executor = None
+        self._requests = {}  # (start, dest, obstacles) -> request in flight
+        self._queue = deque()  # requests waiting for a free worker
+        self._running = 0
+        self._sweeping = False
+        self._sliced = []  # heap of (distance, seq, request, search) for time-sliced searches
+        self._slicing = False
+        self._seq = itertools.count()
+
+        if PATHFINDING_MODE in ("hpa", "auto"):
             """
                 For performance reasons it's optimal to pre-compute HPA* cluster links if obstacles are static
                 If obstacle set changes between pathfinding calls the new set can be passed
                 directly into create_path method
             """
-            print("[INFO] PRE-COMPUTING HPA* CLUSTERS. THIS MAY TAKE A WHILE...")
-            self._clusters = self._precompute_clusters()
-            self._hpa_graph = self._compute_cluster_links(obstacles)
+            if background:
+                threading.Thread(target=self._warm_up, args=(on_ready,), name="hpa-warm-up", daemon=True).start()
+            else:
+                print("[INFO] PRE-COMPUTING HPA* CLUSTERS. THIS MAY TAKE A WHILE...")
+                self._warm_up()
+        else:
+            self._build_landmarks()
+            self.ready.set()
+
+    def _warm_up(self, on_ready: Optional[Callable[["Pathfinder"], None]] = None):
+        started = time.perf_counter()
+        self._clusters = self._precompute_clusters()
+        self._hpa_graph = self._compute_cluster_links(self._obstacles)
+        self._build_landmarks()
+        self.warmup_time = time.perf_counter() - started
+        self.ready.set()
+
+        if on_ready is not None:
+            on_ready(self)
+
+    def _build_landmarks(self):
+        if ALT_LANDMARKS and PATHFINDING_MODE != "simple":
+            self._alt = Landmarks(
+                self._obstacles, self._landmark_candidates, ALT_LANDMARKS, PATHFINDING_MODE != "astar", LANDMARK_CACHE_DIR
+            )
 
     def _precompute_clusters(self):
         """Pre-compute HPA clusters and cluster links"""
@@ -64,6 +123,45 @@ class Pathfinder:
 
         return graph
 
+    def route_clusters(self, start: Location, goal: Location):
+        """
+            Cluster-level route on the HPA* cluster graph, from the cluster of start to the cluster of goal.
+            Returns None if there's no route or HPA* data isn't available
+        """
+        if PATHFINDING_MODE not in ("hpa", "auto") or not self.ready.is_set():
+            return None
+
+        start_c = (start[0] // CLUSTER_SIZE, start[1] // CLUSTER_SIZE)
+        goal_c = (goal[0] // CLUSTER_SIZE, goal[1] // CLUSTER_SIZE)
+        open_set = [(self.manhattan_distance(start_c, goal_c), 0, start_c)]
+        came_from = {start_c: None}
+
+        while open_set:
+            _, g, cur = heapq.heappop(open_set)
+            if cur == goal_c:
+                route = []
+                while cur is not None:
+                    route.append(cur)
+                    cur = came_from[cur]
+
+                return route[::-1]
+
+            for nxt in self._hpa_graph[cur]:
+                if nxt not in came_from:
+                    came_from[nxt] = cur
+                    heapq.heappush(open_set, (g + 1 + self.manhattan_distance(nxt, goal_c), g + 1, nxt))
+
+        return None
+
+    def cluster_anchor(self, cluster: tuple[int, int]):
+        """Walkable square of a cluster closest to its center, None if the whole cluster is blocked"""
+        if cluster not in self._anchors:
+            center = (cluster[0] * CLUSTER_SIZE + CLUSTER_SIZE // 2, cluster[1] * CLUSTER_SIZE + CLUSTER_SIZE // 2)
+            free = [cell for cell in self._clusters[cluster] if cell not in self._obstacles]
+            self._anchors[cluster] = min(free, key=lambda cell: self.chebyshev_distance(cell, center), default=None)
+
+        return self._anchors[cluster]
+
     def manhattan_distance(self, a: Location, b: Location):
         return abs(a[0] - b[0]) + abs(a[1] - b[1])
 
@@ -75,22 +173,212 @@ class Pathfinder:
 
     def create_path(self, start: Location, dest: Location, obstacles: Optional[set[Location]] = None):
         """Create a path using a specified pathfinder algorithm"""
+        return _complete(self.iter_path(start, dest, obstacles))
+
+    def iter_path(self, start: Location, dest: Location, obstacles: Optional[set[Location]] = None, slice_nodes: Optional[int] = None):
+        """Generator version of create_path. 8-way A* and HPA* searches yield every slice_nodes expanded nodes"""
 
         final_obstacle_set = self._obstacles
         if obstacles:
             final_obstacle_set = self._obstacles.union(obstacles)
 
-        if PATHFINDING_MODE == "hpa":
-            path = self.create_hpa_path(start, dest, final_obstacle_set)
+        if PATHFINDING_MODE == "hpa" and not self.ready.is_set():
+            # HPA* data is still warming up, settle for a budgeted search
+            self.degraded_paths += 1
+            path = yield from self.iter_8way_astar_path(start, dest, final_obstacle_set, WARMUP_NODE_BUDGET, slice_nodes)
+        elif PATHFINDING_MODE == "hpa":
+            path = yield from self.iter_hpa_path(start, dest, final_obstacle_set, slice_nodes, alt=True)
         elif PATHFINDING_MODE == "astar":
-            path = self.create_astar_path(start, dest, final_obstacle_set)
+            path = self.create_astar_path(start, dest, final_obstacle_set, alt=True)
         elif PATHFINDING_MODE == "diagonal-astar":
-            path = self.create_8way_astar_path(start, dest, final_obstacle_set)
+            path = yield from self.iter_8way_astar_path(start, dest, final_obstacle_set, slice_nodes=slice_nodes, alt=True)
+        elif PATHFINDING_MODE == "auto":
+            path = yield from self._iter_auto_path(start, dest, final_obstacle_set, slice_nodes)
         else:
             path = self.create_simple_path(start, dest)
 
         return path
 
+    def _iter_auto_path(self, start: Location, dest: Location, obstacles: set[Location], slice_nodes: Optional[int] = None):
+        """
+            Pick a search per request. Straight line if nothing is in the way of a short trip, 8-way A* for short distances and
+            trips within a cluster, HPA* for long ones. For medium distances (up to 3x AUTO_LOCAL_DISTANCE) both are
+            sampled AUTO_SAMPLES times, then the one expanding fewer nodes per path square is used
+        """
+        distance = self.chebyshev_distance(start, dest)
+        if distance <= AUTO_LOCAL_DISTANCE * 3:
+            direct = self.create_simple_path(start, dest)
+            if obstacles.isdisjoint(direct):
+                self._count("direct", distance, direct)
+                return direct
+
+        if not self.ready.is_set():
+            strategy = "budgeted"
+            self.degraded_paths += 1
+        elif distance <= AUTO_LOCAL_DISTANCE or (start[0] // CLUSTER_SIZE, start[1] // CLUSTER_SIZE) == (dest[0] // CLUSTER_SIZE, dest[1] // CLUSTER_SIZE):
+            strategy = "local"
+        elif distance <= AUTO_LOCAL_DISTANCE * 3:
+            local, hpa = self._medium_stats["local"], self._medium_stats["hpa"]
+            if local[0] < AUTO_SAMPLES or hpa[0] < AUTO_SAMPLES:
+                strategy = "local" if local[0] <= hpa[0] else "hpa"
+            else:
+                # nodes per square, cross-multiplied
+                strategy = "local" if local[1] * max(hpa[2], 1) <= hpa[1] * max(local[2], 1) else "hpa"
+        else:
+            strategy = "hpa"
+
+        nodes = self.expanded_nodes
+        if strategy == "hpa":
+            path = yield from self.iter_hpa_path(start, dest, obstacles, slice_nodes, alt=True)
+        else:
+            max_nodes = WARMUP_NODE_BUDGET if strategy == "budgeted" else None
+            path = yield from self.iter_8way_astar_path(start, dest, obstacles, max_nodes, slice_nodes, alt=True)
+
+        nodes = self.expanded_nodes - nodes
+        self._count(strategy, nodes, path)
+        if strategy in self._medium_stats and AUTO_LOCAL_DISTANCE < distance <= AUTO_LOCAL_DISTANCE * 3:
+            sample = self._medium_stats[strategy]
+            sample[0] += 1
+            sample[1] += nodes
+            sample[2] += len(path or ())
+
+        return path
+
+    def _count(self, strategy: str, nodes: int, path: Optional[list[Location]]):
+        stats = self.strategy_stats[strategy]
+        stats["calls"] += 1
+        stats["nodes"] += nodes
+        stats["squares"] += len(path or ())
+
+    def pursue(self, start: Location, target: Location):
+        """Incremental search to a moving target, see Pursuit"""
+        return Pursuit(self, start, target, set() if PATHFINDING_MODE == "simple" else None)
+
+    def create_path_async(
+        self, start: Location, dest: Location, obstacles: Optional[set[Location]] = None,
+        cancelled: Optional[Callable[[], bool]] = None
+    ):
+        """
+            Awaitable version of create_path, returns a future. Searches run in a worker pool (PATHFINDING_EXECUTOR),
+            at most PATHFINDING_WORKERS at once, or time-sliced on the event loop, see _run_slices.
+            Identical requests in flight share a single search.
+            Once cancelled returns true (i.e.: the squad has died), the future resolves to None without waiting
+        """
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+
+        if PATHFINDING_EXECUTOR == "inline":
+            waiter.set_result(self.create_path(start, dest, obstacles))
+            return waiter
+
+        key = (start, dest, frozenset(obstacles) if obstacles else None)
+        request = self._requests.get(key)
+        if request is None:
+            request = self._requests[key] = _PathRequest(key, obstacles)
+            if PATHFINDING_EXECUTOR == "sliced":
+                search = self.iter_path(start, dest, obstacles, PATHFINDING_SLICE)
+                heapq.heappush(self._sliced, (self.chebyshev_distance(start, dest), next(self._seq), request, search))
+            else:
+                self._queue.append(request)
+
+        request.waiters.append((waiter, cancelled))
+        if PATHFINDING_EXECUTOR == "sliced":
+            if not self._slicing:
+                self._slicing = True
+                loop.call_soon(self._run_slices, loop)
+        else:
+            self._pump(loop)
+
+        if not self._sweeping:
+            self._sweeping = True
+            loop.call_later(1, self._sweep, loop)
+
+        return waiter
+
+    def _pump(self, loop: asyncio.AbstractEventLoop):
+        """Start queued searches while there are free workers"""
+        while self._queue and self._running < PATHFINDING_WORKERS:
+            request = self._queue.popleft()
+            if not request.prune():
+                del self._requests[request.key]  # everyone waiting for it is gone
+                continue
+
+            if self._executor is None:
+                if PATHFINDING_EXECUTOR == "process":
+                    self._executor = ProcessPoolExecutor(PATHFINDING_WORKERS, initializer=_init_worker, initargs=(self._obstacles, self._landmark_candidates))
+                else:
+                    self._executor = ThreadPoolExecutor(PATHFINDING_WORKERS, thread_name_prefix="pathfinder")
+
+            search = _search if PATHFINDING_EXECUTOR == "process" else self.create_path
+            start, dest, _ = request.key
+            self._running += 1
+            future = loop.run_in_executor(self._executor, search, start, dest, request.obstacles)
+            future.add_done_callback(lambda f, r=request: self._finish(loop, r, f))
+
+    def _finish(self, loop: asyncio.AbstractEventLoop, request: "_PathRequest", future: asyncio.Future):
+        self._running -= 1
+        if future.cancelled():  # pool was shut down
+            self._deliver(request, None)
+        else:
+            self._deliver(request, None if future.exception() else future.result(), future.exception())
+
+        self._pump(loop)
+
+    def _run_slices(self, loop: asyncio.AbstractEventLoop):
+        """
+            Advance time-sliced searches by up to PATHFINDING_TICK_BUDGET nodes in total, then yield to the event loop.
+            Shortest requests go first, so a burst of long searches doesn't hold up the short ones
+        """
+        budget = PATHFINDING_TICK_BUDGET
+        while self._sliced and budget > 0:
+            _, _, request, search = self._sliced[0]
+            if not request.prune():
+                heapq.heappop(self._sliced)
+                del self._requests[request.key]  # everyone waiting for it is gone
+                continue
+
+            try:
+                budget -= next(search)
+            except StopIteration as e:
+                heapq.heappop(self._sliced)
+                self._deliver(request, e.value)
+            except Exception as e:
+                heapq.heappop(self._sliced)
+                self._deliver(request, None, e)
+
+        if self._sliced:
+            loop.call_soon(self._run_slices, loop)
+        else:
+            self._slicing = False
+
+    def _deliver(self, request: "_PathRequest", path: Optional[list[Location]], error: Optional[BaseException] = None):
+        del self._requests[request.key]
+
+        request.prune()
+        for waiter, _ in request.waiters:
+            if error is not None:
+                waiter.set_exception(error)
+            else:
+                # every waiter gets its own copy, paths are consumed by tasks
+                waiter.set_result(list(path) if path is not None else None)
+
+    def _sweep(self, loop: asyncio.AbstractEventLoop):
+        """Release waiters of cancelled requests"""
+        for request in self._requests.values():
+            request.prune()
+
+        if self._requests:
+            loop.call_later(1, self._sweep, loop)
+        else:
+            self._sweeping = False
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+        return True
+
     def create_simple_path(self, start: Location, dest: Location):
         """Simple direct path on a 2D grid with 8-direction movement"""
 
@@ -113,17 +401,42 @@ class Pathfinder:
 
         return path
 
-    def create_8way_astar_path(self, start: Location, goal: Location, obstacles: set[Location]):
-        """A* pathfinding on a 2D grid with 8-direction movement"""
+    def create_8way_astar_path(self, start: Location, goal: Location, obstacles: set[Location], max_nodes: Optional[int] = None):
+        """
+            A* pathfinding on a 2D grid with 8-direction movement. If the number of expanded nodes exceeds max_nodes,
+            a partial path to the expanded node closest to the goal is returned
+        """
+        return _complete(self.iter_8way_astar_path(start, goal, obstacles, max_nodes))
+
+    def iter_8way_astar_path(
+        self, start: Location, goal: Location, obstacles: set[Location], max_nodes: Optional[int] = None,
+        slice_nodes: Optional[int] = None, alt: bool = False
+    ):
+        """
+            Generator version of create_8way_astar_path for time-sliced searches.
+            Yields the number of nodes expanded every slice_nodes nodes, returns the path.
+            Set alt if obstacles include the map obstacles, so landmark distances can be used as a heuristic
+        """
+
+        bound = self._alt.heuristic(start, goal) if alt and self._alt is not None and self._alt.diagonal else None
 
         open_set = []
         heapq.heappush(open_set, (self.chebyshev_distance(start, goal), 0, start))
         came_from = {}
         g_score = {start: 0}
+        expanded = 0
+        closest, closest_h = start, self.chebyshev_distance(start, goal)
 
         while open_set:
             _, current_g, current = heapq.heappop(open_set)
-            if current == goal:
+            if current == goal or (max_nodes is not None and expanded >= max_nodes):
+                if current != goal:
+                    current = closest
+
+                self.expanded_nodes += expanded
+                if slice_nodes and expanded % slice_nodes:
+                    yield expanded % slice_nodes  # count the rest as well, HPA* runs lots of short searches
+
                 # Reconstruct path
                 path = []
                 while current in came_from:
@@ -132,6 +445,13 @@ class Pathfinder:
 
                 return path[::-1]
 
+            expanded += 1
+            if max_nodes is not None and (h := self.chebyshev_distance(current, goal)) < closest_h:
+                closest, closest_h = current, h
+
+            if slice_nodes and not expanded % slice_nodes:
+                yield slice_nodes
+
             for dx, dy in self._neighbors_including_diagonals:
                 neighbor = (current[0] + dx, current[1] + dy)
                 if not self.in_bounds(*neighbor) or neighbor in obstacles:
@@ -142,14 +462,20 @@ class Pathfinder:
                 if tentative_g < g_score.get(neighbor, float('inf')):
                     came_from[neighbor] = current
                     g_score[neighbor] = tentative_g
-                    f_score = tentative_g + self.chebyshev_distance(neighbor, goal)
+                    h = self.chebyshev_distance(neighbor, goal)
+                    if bound is not None and (b := bound(neighbor)) > h:
+                        h = b
+                    f_score = tentative_g + h
                     heapq.heappush(open_set, (f_score, tentative_g, neighbor))
 
+        self.expanded_nodes += expanded
+
         return None
 
-    def create_astar_path(self, start: Location, goal: Location, obstacles: set[Location]):
-        """A* pathfinding on a 2D grid with 4-direction movement"""
+    def create_astar_path(self, start: Location, goal: Location, obstacles: set[Location], alt: bool = False):
+        """A* pathfinding on a 2D grid with 4-direction movement. See iter_8way_astar_path for alt"""
 
+        bound = self._alt.heuristic(start, goal) if alt and self._alt is not None and not self._alt.diagonal else None
         open_set = [(self.manhattan_distance(start, goal), 0, start, [start])]
         visited = set()
 
@@ -171,12 +497,21 @@ class Pathfinder:
             for dx, dy in [(1, 0), (-1, 0), (0, 1), (0, -1)]:
                 nx, ny = current[0] + dx, current[1] + dy
                 if self.in_bounds(nx, ny) and (nx, ny) not in obstacles:
-                    heapq.heappush(open_set, (g + 1 + self.manhattan_distance((nx, ny), goal), g + 1, (nx, ny), path + [(nx, ny)]))
+                    h = self.manhattan_distance((nx, ny), goal)
+                    if bound is not None and (b := bound((nx, ny))) > h:
+                        h = b
+                    heapq.heappush(open_set, (g + 1 + h, g + 1, (nx, ny), path + [(nx, ny)]))
 
         return None
 
     def create_hpa_path(self, start: Location, goal: Location, obstacles: set[Location]):
         """HPA* pathfinding on a 2D grid with 8-directional movement"""
+        return _complete(self.iter_hpa_path(start, goal, obstacles))
+
+    def iter_hpa_path(
+        self, start: Location, goal: Location, obstacles: set[Location], slice_nodes: Optional[int] = None, alt: bool = False
+    ):
+        """Generator version of create_hpa_path, see iter_8way_astar_path"""
 
         def cluster_of(cell):
             return (cell[0] // CLUSTER_SIZE, cell[1] // CLUSTER_SIZE)
@@ -184,7 +519,7 @@ class Pathfinder:
         start_c, goal_c = cluster_of(start), cluster_of(goal)
         # Both points inside the same cluster - fallback to plain A*
         if start_c == goal_c:
-            return self.create_8way_astar_path(start, goal, obstacles)
+            return (yield from self.iter_8way_astar_path(start, goal, obstacles, slice_nodes=slice_nodes, alt=alt))
 
         # Obstacle set changed, need to rebuild cluster links
         if obstacles != self._obstacles:
@@ -206,13 +541,17 @@ class Pathfinder:
                 continue
 
             visited.add(cur)
+            if slice_nodes and not len(visited) % slice_nodes:
+                yield slice_nodes
+
             for nxt in graph[cur]:
                 if nxt not in visited:
                     heapq.heappush(open_set, (g + 1 + self.manhattan_distance(nxt, goal_c), g + 1, nxt, path + [nxt]))
 
+        self.expanded_nodes += len(visited)
         if not cluster_path:
             # Fallback to plain A*
-            return self.create_8way_astar_path(start, goal, obstacles)
+            return (yield from self.iter_8way_astar_path(start, goal, obstacles, slice_nodes=slice_nodes, alt=alt))
 
         # Refine each cluster-to-cluster hop
         full_path = [start]
@@ -229,7 +568,7 @@ class Pathfinder:
             # Pick the closest border cell to our current position
             border_cells.sort(key=lambda p: self.manhattan_distance(p, current))
             if not border_cells:
-                return self.create_8way_astar_path(start, goal, obstacles)
+                return (yield from self.iter_8way_astar_path(start, goal, obstacles, slice_nodes=slice_nodes, alt=alt))
 
             next_goal = border_cells[0]
             if next_goal == current:
@@ -240,7 +579,7 @@ class Pathfinder:
             if not set(tentative_path) & obstacles:
                 segment = tentative_path
             else:
-                segment = self.create_8way_astar_path(current, next_goal, obstacles)
+                segment = yield from self.iter_8way_astar_path(current, next_goal, obstacles, slice_nodes=slice_nodes, alt=alt)
 
             if not segment:
                 return None
@@ -253,9 +592,184 @@ class Pathfinder:
         if not set(tentative_path) & obstacles:
             segment = tentative_path
         else:
-            segment = self.create_8way_astar_path(current, goal, obstacles)
+            segment = yield from self.iter_8way_astar_path(current, goal, obstacles, slice_nodes=slice_nodes, alt=alt)
 
         if segment:
             full_path.extend(segment)
 
         return full_path[1:]
+
+
+def _complete(search: Generator):
+    """Run a search generator to completion"""
+    try:
+        while True:
+            next(search)
+    except StopIteration as e:
+        return e.value
+
+
+class _PathRequest:
+    """Search shared by everyone waiting for the same path"""
+
+    __slots__ = ("key", "obstacles", "waiters")
+
+    def __init__(self, key: tuple, obstacles: Optional[set[Location]]):
+        self.key = key
+        self.obstacles = obstacles
+        self.waiters = []  # (future, cancelled predicate)
+
+    def prune(self):
+        """Resolve waiters that are no longer interested with None. Returns true if anyone is still waiting"""
+        waiters = []
+        for waiter, cancelled in self.waiters:
+            if waiter.done():
+                continue
+
+            if cancelled is not None and cancelled():
+                waiter.set_result(None)
+            else:
+                waiters.append((waiter, cancelled))
+
+        self.waiters = waiters
+
+        return bool(waiters)
+
+
+_worker = None  # pathfinder of a process pool worker
+
+
+def _init_worker(obstacles: set[Location], landmarks: list[Location]):
+    global _worker
+    _worker = Pathfinder(obstacles, landmarks=landmarks)
+
+
+def _search(start: Location, dest: Location, obstacles: Optional[set[Location]]):
+    return _worker.create_path(start, dest, obstacles)
+
+
+class Pursuit:
+    """
+        Incremental path to a moving target (D* Lite on the 8-way grid). The search runs backwards from an anchor
+        at the target position and is kept between replans, so hunter movement only shifts the heuristic.
+        While the target stays within PURSUIT_SLACK squares of the anchor, the last few squares of the path
+        are replaced with a short local search. Only targets drifting further away cost a new search
+    """
+
+    def __init__(self, pathfinder: Pathfinder, start: Location, target: Location, obstacles: Optional[set[Location]] = None):
+        self._pathfinder = pathfinder
+        self._obstacles = obstacles if obstacles is not None else pathfinder._obstacles
+        self._start = start
+        self._adjacent = {}  # cell -> walkable neighbors with step costs
+        self.searches = 0  # number of full searches, for diagnostics
+        self._anchor(target)
+
+    def _anchor(self, target: Location):
+        self._root = target
+        self._km = 0  # accumulated heuristic shift from hunter movement
+        self._g = {}
+        self._rhs = {target: 0}
+        self._open = []  # (key, cell) heap, outdated entries are skipped
+        self._keys = {}  # cell -> key of its current open set entry
+        self._push(target)
+        self.searches += 1
+
+    def _neighbors(self, cell: Location):
+        adjacent = self._adjacent.get(cell)
+        if adjacent is None:
+            adjacent = self._adjacent[cell] = [
+                # Diagonals are more expensive
+                ((cell[0] + dx, cell[1] + dy), 1.4142 if dx != 0 and dy != 0 else 1.0)
+                for dx, dy in self._pathfinder._neighbors_including_diagonals
+                if self._pathfinder.in_bounds(cell[0] + dx, cell[1] + dy) and (cell[0] + dx, cell[1] + dy) not in self._obstacles
+            ]
+
+        return adjacent
+
+    def _key(self, cell: Location):
+        best = min(self._g.get(cell, math.inf), self._rhs.get(cell, math.inf))
+        return best + self._pathfinder.chebyshev_distance(self._start, cell) + self._km, best
+
+    def _push(self, cell: Location):
+        key = self._keys[cell] = self._key(cell)
+        heapq.heappush(self._open, (key, cell))
+
+    def _update(self, cell: Location):
+        """Refresh open set membership of a cell after its rhs has changed"""
+        if self._g.get(cell, math.inf) != self._rhs.get(cell, math.inf):
+            self._push(cell)
+        else:
+            self._keys.pop(cell, None)
+
+    def _recompute_rhs(self, cell: Location):
+        if cell != self._root:
+            self._rhs[cell] = min((self._g.get(n, math.inf) + cost for n, cost in self._neighbors(cell)), default=math.inf)
+
+    def _compute(self):
+        g, rhs, start = self._g, self._rhs, self._start
+        while self._open:
+            key, cell = self._open[0]
+            if self._keys.get(cell) != key:
+                heapq.heappop(self._open)
+                continue
+
+            if key >= self._key(start) and rhs.get(start, math.inf) == g.get(start, math.inf):
+                break
+
+            heapq.heappop(self._open)
+            new_key = self._key(cell)
+            if key < new_key:
+                self._push(cell)
+            elif g.get(cell, math.inf) > rhs.get(cell, math.inf):
+                # cell got cheaper, neighbors can only get cheaper through it
+                value = g[cell] = rhs[cell]
+                del self._keys[cell]
+                for neighbor, cost in self._neighbors(cell):
+                    if value + cost < rhs.get(neighbor, math.inf) and neighbor != self._root:
+                        rhs[neighbor] = value + cost
+                        self._update(neighbor)
+            else:
+                # cell got more expensive, neighbors that relied on it need their rhs recomputed
+                old = g.get(cell, math.inf)
+                g[cell] = math.inf
+                for neighbor, cost in self._neighbors(cell) + [(cell, 0)]:
+                    if rhs.get(neighbor, math.inf) == old + cost:
+                        self._recompute_rhs(neighbor)
+                    self._update(neighbor)
+
+    def _descend(self, start: Location):
+        """Follow the search tree from start to the anchor"""
+        path = []
+        current = start
+        while current != self._root:
+            current = min(self._neighbors(current), key=lambda n: n[1] + self._g.get(n[0], math.inf))[0]
+            path.append(current)
+            if len(path) > len(self._g):  # safety net, greedy descent should never cycle
+                return None
+
+        return path
+
+    def path(self, start: Location, target: Location):
+        """Path from start to the current target position, replanning incrementally. None if there's no path"""
+        if start != self._start:
+            self._km += self._pathfinder.chebyshev_distance(self._start, start)
+            self._start = start
+
+        if self._pathfinder.chebyshev_distance(self._root, target) > PURSUIT_SLACK:
+            self._anchor(target)
+
+        self._compute()
+        if self._g.get(start, math.inf) == math.inf:
+            return None
+
+        path = self._descend(start)
+        if path is None or target == self._root:
+            return path
+
+        # Target has drifted from the anchor, search locally from a few squares before the anchor instead
+        junction = max(0, len(path) - PURSUIT_SLACK - 1)
+        tail = self._pathfinder.create_8way_astar_path(path[junction - 1] if junction else start, target, self._obstacles)
+        if tail is None:
+            return None
+
+        return path[:junction] + tail
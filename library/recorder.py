@@ -0,0 +1,227 @@
+import json
+import struct
+import time
+
+from typing import Callable, Optional
+
+from config import MAP, GRID_X_SIZE, GRID_Y_SIZE, FACTIONS
+
+from library.actor import Actor
+from library.squad import Squad
+
+MAGIC = b"ALIFEREC"
+VERSION = 1
+
+# Record types. Every record starts with a type byte and event time in milliseconds
+SPAWN, MOVE, REMOVE, DEATH, CORPSE, LOOTED, TASK, COMBAT, NAME = range(1, 10)
+
+_HEADER = struct.Struct("<BI")
+_RECORDS = {
+    SPAWN: struct.Struct("<IBHHB12s"),  # squad id, faction, x, y, number of actors, squad SID
+    MOVE: struct.Struct("<IHH"),  # squad id, x, y
+    REMOVE: struct.Struct("<I"),  # squad id
+    DEATH: struct.Struct("<I"),  # squad id, squad loses an actor
+    CORPSE: struct.Struct("<IBHH"),  # corpse id, faction, x, y
+    LOOTED: struct.Struct("<I"),  # corpse id, corpse is removed from the grid
+    TASK: struct.Struct("<IB"),  # squad id, task name id
+    COMBAT: struct.Struct("<IIBBB"),  # left squad id, right squad id, left has won, left losses, right losses
+    NAME: struct.Struct("<B32s"),  # task name id, task name
+}
+
+
+def metadata(seed: Optional[int] = None):
+    """Run description stored in front of the event stream"""
+    return {
+        "version": VERSION,
+        "seed": seed,
+        "map": MAP,
+        "grid": [GRID_X_SIZE, GRID_Y_SIZE],
+        "factions": list(FACTIONS)
+    }
+
+
+def encode(record_type: int, ms: int, *fields):
+    return _HEADER.pack(record_type, ms) + _RECORDS[record_type].pack(*fields)
+
+
+def decode(data: bytes, offset: int = 0, end: Optional[int] = None):
+    """Iterate over encoded records as (time in seconds, record type, fields) tuples"""
+    end = len(data) if end is None else end
+    header_size = _HEADER.size
+    while offset < end:
+        record_type, ms = _HEADER.unpack_from(data, offset)
+        record = _RECORDS[record_type]
+        yield ms / 1000, record_type, record.unpack_from(data, offset + header_size)
+        offset += header_size + record.size
+
+
+class EventEncoder:
+    """
+        Turns grid events into compact binary records. Subscribe it to the grid with MapGrid.add_listener.
+        Squads and corpses get small integer ids, consecutive remove/place events of a squad are encoded as a single move.
+        Subclasses decide where records go by implementing _write
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._factions = {f: i for i, f in enumerate(FACTIONS)}
+        self._squads = {}  # sid -> squad id
+        self._corpses = {}  # id(actor) -> corpse id
+        self._names = {}  # task name -> name id
+        self._pending_remove = None  # squad removal that can turn out to be a part of a move
+        self._next_id = 0
+
+    def __call__(self, event: str, *args):
+        if self._pending_remove is not None:
+            squad = self._pending_remove
+            self._pending_remove = None
+            if event == "place" and args[0] is squad:
+                self._write(MOVE, self._squads[squad.sid], *args[1])
+                return
+
+            self._write(REMOVE, self._squads[squad.sid])
+
+        handler = getattr(self, f"_on_{event}", None)
+        if handler is not None:
+            handler(*args)
+
+    def _write(self, record_type: int, *fields):
+        raise NotImplementedError
+
+    def _new_id(self):
+        self._next_id += 1
+        return self._next_id
+
+    def _on_place(self, entity, square):
+        if isinstance(entity, Squad):
+            squad_id = self._squads.get(entity.sid)
+            if squad_id is None:
+                squad_id = self._squads[entity.sid] = self._new_id()
+                self._write(SPAWN, squad_id, self._factions[entity.faction], *square, entity.num_actors(), entity.sid.encode())
+            else:
+                self._write(MOVE, squad_id, *square)
+        else:
+            corpse_id = self._corpses[id(entity)] = self._new_id()
+            self._write(CORPSE, corpse_id, self._factions[entity.faction], *square)
+
+    def _on_remove(self, entity, square):
+        if isinstance(entity, Squad):
+            if entity.sid in self._squads:
+                self._pending_remove = entity
+        elif (corpse_id := self._corpses.pop(id(entity), None)) is not None:
+            self._write(LOOTED, corpse_id)
+
+    def _on_death(self, squad, actor, square):
+        if squad.sid in self._squads:
+            self._write(DEATH, self._squads[squad.sid])
+
+    def _on_task(self, squad, name):
+        if squad.sid not in self._squads:
+            return
+
+        name_id = self._names.get(name)
+        if name_id is None:
+            name_id = self._names[name] = len(self._names)
+            self._write(NAME, name_id, name.encode())
+
+        self._write(TASK, self._squads[squad.sid], name_id)
+
+    def _on_combat(self, left, right, winner, left_losses, right_losses):
+        if left.sid in self._squads and right.sid in self._squads:
+            self._write(COMBAT, self._squads[left.sid], self._squads[right.sid], winner is left, left_losses, right_losses)
+
+    def flush(self):
+        """Write out a removal held back in case it's a part of a move"""
+        if self._pending_remove is not None:
+            self._write(REMOVE, self._squads[self._pending_remove.sid])
+            self._pending_remove = None
+
+        return True
+
+
+class EventRecorder(EventEncoder):
+    """Records grid events into a compact binary file, see EventReplayer"""
+
+    def __init__(self, path: str, clock: Callable[[], float] = time.monotonic, seed: Optional[int] = None):
+        super().__init__(clock)
+        self._file = open(path, "wb")
+
+        header = json.dumps(metadata(seed)).encode()
+        self._file.write(MAGIC + struct.pack("<I", len(header)) + header)
+
+    def _write(self, record_type: int, *fields):
+        self._file.write(encode(record_type, int(self._clock() * 1000), *fields))
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+        return True
+
+
+class EventReplayer:
+    """Rebuilds grid state from a recorded event stream without running tasks or pathfinding"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            data = f.read()
+
+        if not data.startswith(MAGIC):
+            raise ValueError(f"{path} is not an event recording")
+
+        offset = len(MAGIC)
+        (length,) = struct.unpack_from("<I", data, offset)
+        offset += 4
+
+        self.metadata = json.loads(data[offset:offset + length])
+        self._data = data
+        self._start = offset + length
+
+    def events(self):
+        """Iterate over recorded events as (time in seconds, record type, fields) tuples"""
+        return decode(self._data, self._start)
+
+    def replay(self, grid, on_frame: Optional[Callable[[float], None]] = None, frame_interval: float = 1.0):
+        """
+            Apply all recorded events to a grid. If specified, on_frame is called with the current
+            simulation time every frame_interval seconds of recorded time, i.e. to redraw the grid
+        """
+        factions = self.metadata["factions"]
+        squads = {}
+        corpses = {}
+        next_frame = frame_interval
+        count = 0
+
+        for event_time, record_type, fields in self.events():
+            while on_frame is not None and event_time >= next_frame:
+                on_frame(next_frame)
+                next_frame += frame_interval
+
+            if record_type == MOVE:
+                squad = squads[fields[0]]
+                grid.remove(squad)
+                squad.location = (fields[1], fields[2])
+                grid.place(squad, squad.location)
+            elif record_type == SPAWN:
+                squad_id, faction, x, y, size, sid = fields
+                squad = squads[squad_id] = Squad(factions[faction], (x, y))
+                squad.sid = sid.decode()
+                squad.actors = [None] * size  # stand-ins, only the squad size is recorded
+                grid.place(squad, squad.location)
+            elif record_type == REMOVE:
+                grid.remove(squads[fields[0]])  # squads handed off to other regions can come back later
+            elif record_type == DEATH:
+                squads[fields[0]].actors.pop()
+            elif record_type == CORPSE:
+                corpse_id, faction, x, y = fields
+                corpse = corpses[corpse_id] = Actor(factions[faction], (x, y))
+                grid.place(corpse, corpse.location)
+            elif record_type == LOOTED:
+                grid.remove(corpses.pop(fields[0]))
+
+            count += 1
+
+        if on_frame is not None:
+            on_frame(next_frame)
+
+        return count
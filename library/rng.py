@@ -0,0 +1,45 @@
+import random
+import uuid
+
+from typing import Optional
+
+_seed = None
+_streams = {}
+
+
+def get_seed():
+    return _seed
+
+
+def seed(value: Optional[int | str]):
+    """Seed all random streams. None switches back to the global random module"""
+    global _seed
+
+    _seed = value
+    _streams.clear()
+
+    return True
+
+
+def get_rng(subsystem: str):
+    """
+        Get a random stream for a given subsystem (i.e.: spawn, actor, tasks, combat).
+        Every subsystem gets an independent stream in seeded runs, so adding a random call in one place
+        does not shift the outcomes everywhere else. Unseeded runs share the global random module
+    """
+    if _seed is None:
+        return random
+
+    stream = _streams.get(subsystem)
+    if stream is None:
+        stream = _streams[subsystem] = random.Random(f"{_seed}:{subsystem}")
+
+    return stream
+
+
+def new_uuid(subsystem: str):
+    """Random UUID, reproducible in seeded runs"""
+    if _seed is None:
+        return uuid.uuid4()
+
+    return uuid.UUID(int=get_rng(subsystem).getrandbits(128), version=4)
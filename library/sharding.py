@@ -0,0 +1,310 @@
+import asyncio
+import bisect
+import multiprocessing
+import pickle
+import queue
+import random
+import signal
+import threading
+import time
+
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from config import GRID_X_SIZE, GRID_Y_SIZE, CLUSTER_SIZE, BORDER_MARGIN, BORDER_SYNC_INTERVAL, SPAWN_FREQUENCY
+
+from library.grid import MapGrid
+from library import rng
+from library.tasks import MoveTask, HuntSquadTask
+from library.types import Location
+
+
+@dataclass(frozen=True)
+class Region:
+    """Rectangular part of the grid simulated by a single process. Upper bounds are exclusive"""
+    rid: int
+    x_min: int
+    y_min: int
+    x_max: int
+    y_max: int
+
+    def contains(self, square: Location):
+        return self.x_min <= square[0] < self.x_max and self.y_min <= square[1] < self.y_max
+
+    def is_near_border(self, square: Location, margin: int):
+        """Check if a square is within a given distance of a border shared with another region"""
+        x, y = square
+        return (
+            (self.x_min > 0 and x - self.x_min < margin)
+            or (self.x_max < GRID_X_SIZE and self.x_max - 1 - x < margin)
+            or (self.y_min > 0 and y - self.y_min < margin)
+            or (self.y_max < GRID_Y_SIZE and self.y_max - 1 - y < margin)
+        )
+
+    def touches(self, other: "Region"):
+        """Check if two regions share a border or a corner"""
+        return (other.rid != self.rid
+                and other.x_min <= self.x_max and self.x_min <= other.x_max
+                and other.y_min <= self.y_max and self.y_min <= other.y_max)
+
+
+class Partition:
+    """Splits the grid into rectangular regions. Region borders are aligned with HPA* cluster borders"""
+
+    def __init__(self, x_regions: int, y_regions: int):
+        self._x_bounds = self._split(GRID_X_SIZE, x_regions)
+        self._y_bounds = self._split(GRID_Y_SIZE, y_regions)
+
+        self.regions = []
+        for i in range(len(self._x_bounds) - 1):
+            for j in range(len(self._y_bounds) - 1):
+                self.regions.append(Region(len(self.regions), self._x_bounds[i], self._y_bounds[j],
+                                           self._x_bounds[i + 1], self._y_bounds[j + 1]))
+
+        self._neighbors = {r.rid: [n.rid for n in self.regions if r.touches(n)] for r in self.regions}
+
+    @staticmethod
+    def _split(size: int, parts: int):
+        """Split grid dimension into a number of parts, snapping every boundary to a cluster border"""
+        num_clusters = -(-size // CLUSTER_SIZE)
+        parts = max(1, min(parts, num_clusters))
+
+        bounds = [min(size, (num_clusters * i // parts) * CLUSTER_SIZE) for i in range(parts)]
+        bounds.append(size)
+
+        return bounds
+
+    def region_of(self, square: Location):
+        """Find the region that owns a given square"""
+        i = bisect.bisect_right(self._x_bounds, square[0]) - 1
+        j = bisect.bisect_right(self._y_bounds, square[1]) - 1
+        i = max(0, min(i, len(self._x_bounds) - 2))
+        j = max(0, min(j, len(self._y_bounds) - 2))
+
+        return self.regions[i * (len(self._y_bounds) - 1) + j]
+
+    def neighbors(self, rid: int):
+        return self._neighbors[rid]
+
+
+@dataclass
+class BorderSquad:
+    """Read-only copy of a squad living close to the border in a neighboring region"""
+    sid: str
+    faction: str
+    location: Location
+    size: int
+
+    def __str__(self):
+        return f"{self.faction} squad (SID={self.sid}) ({self.size} {self.size > 1 and "actors" or "actor"})"
+
+    def num_actors(self):
+        return self.size
+
+
+class Shard:
+    """Region-specific state of a grid running in sharded mode. Talks to the coordinator through message queues"""
+
+    def __init__(self, region: Region, outbox):
+        self.region = region
+        self._outbox = outbox
+        self._ghosts = {}  # neighbor region id -> {sid: BorderSquad}
+
+    def owns(self, square: Location):
+        return self.region.contains(square)
+
+    def hand_off(self, squad, resume: Optional[tuple] = None):
+        """
+            Send a squad to the region that owns its current location.
+            Squad is serialized right away, so changes made to the local copy afterwards are not transferred
+        """
+        self._outbox.put(("handoff", squad.location, pickle.dumps((squad, resume))))
+
+        return True
+
+    def get_ghosts(self, low_x: int, high_x: int, low_y: int, high_y: int):
+        """Get squads from neighboring regions within a given area"""
+        return [
+            ghost for ghosts in self._ghosts.values() for ghost in ghosts.values()
+            if low_x <= ghost.location[0] < high_x and low_y <= ghost.location[1] < high_y
+        ]
+
+    def update_ghosts(self, rid: int, entries: list[tuple]):
+        """Refresh squads published by a neighbor. Existing copies are updated in place, so hunters see the movement"""
+        current = self._ghosts.get(rid, {})
+        updated = {}
+        for sid, faction, location, size in entries:
+            ghost = current.get(sid)
+            if ghost is None:
+                ghost = BorderSquad(sid, faction, location, size)
+            else:
+                ghost.location, ghost.size = location, size
+
+            updated[sid] = ghost
+
+        self._ghosts[rid] = updated
+
+        return True
+
+    def publish_border(self, grid: MapGrid):
+        """Publish squads close to the region border, so neighbors can include them in their hunt queries"""
+        entries = []
+        for square, entities in grid.get_grid().items():
+            if not self.region.is_near_border(square, BORDER_MARGIN):
+                continue
+
+            entries.extend((s.sid, s.faction, s.location, s.num_actors()) for s in entities[0] if s.actors)
+
+        self._outbox.put(("border", self.region.rid, entries))
+
+        return True
+
+    def receive(self, loop, grid: MapGrid, message: tuple):
+        """Handle a single message sent by the coordinator"""
+        kind = message[0]
+
+        if kind == "handoff":
+            squad, resume = pickle.loads(message[2])
+            squad.has_task = False
+            grid.place(squad, squad.location)
+
+            if resume is None:
+                return True
+
+            task = None
+            if resume[0] == "move":
+                task = MoveTask(grid, squad, resume[1])
+            elif resume[0] == "hunt":
+                target = grid.find_squad(resume[1])
+                if target is not None:
+                    task = HuntSquadTask(grid, squad, target)
+
+            if task is not None:
+                # task loop of the region picks the squad up again once the resumed task is complete
+                loop.create_task(task.execute()).add_done_callback(lambda _: grid.mark_dirty(squad.location))
+
+        elif kind == "border":
+            self.update_ghosts(message[1], message[2])
+
+        elif kind == "spawn":
+            grid.spawn(message[1])
+
+        elif kind == "stop":
+            loop.stop()
+
+        return True
+
+
+def run_region(region: Region, inbox, outbox, task_loop: Callable, factions: list[str]):
+    """Process entry point. Runs a single region with its own grid and task loop"""
+
+    # Shutdown is handled by the coordinator
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # Forked processes inherit the random state, every region needs its own
+    if rng.get_seed() is None:
+        random.seed()
+    else:
+        rng.seed(f"{rng.get_seed()}:region-{region.rid}")
+
+    grid = MapGrid()
+    grid.shard = Shard(region, outbox)
+    grid.add_log_msg("INFO", f" Starting region {region.rid} {region}...")
+
+    # Squads spawned outside the region are handed off to their owners right away
+    for faction in factions:
+        grid.spawn(faction)
+
+    loop = asyncio.new_event_loop()
+
+    def inbox_reader():
+        # Blocking reads happen in a separate thread, messages are handled in the event loop
+        while True:
+            message = inbox.get()
+            loop.call_soon_threadsafe(grid.shard.receive, loop, grid, message)
+            if message[0] == "stop":
+                break
+
+    async def border_publisher():
+        while True:
+            await asyncio.sleep(BORDER_SYNC_INTERVAL)
+            grid.shard.publish_border(grid)
+
+    main_task = loop.create_task(task_loop(loop, grid))
+    threading.Thread(target=inbox_reader, daemon=True).start()
+    loop.create_task(border_publisher())
+
+    try:
+        loop.run_forever()
+    finally:
+        main_task.cancel()
+
+
+class Coordinator:
+    """
+        Local coordinator for sharded runs. Starts a process per region and routes messages between them.
+        Combat never crosses region borders, since each square is owned by exactly one region,
+        so only squad handoffs, border squad updates and spawns go through here
+    """
+
+    def __init__(self, task_loop: Callable, x_regions: int, y_regions: int):
+        self.partition = Partition(x_regions, y_regions)
+        self._task_loop = task_loop
+        self._outbox = multiprocessing.Queue()
+        self._inboxes = {r.rid: multiprocessing.Queue() for r in self.partition.regions}
+        self._processes = []
+
+    def start(self, squads: list[str]):
+        """Start region processes, distributing initial squads between them"""
+        regions = self.partition.regions
+        for region in regions:
+            factions = squads[region.rid::len(regions)]
+            process = multiprocessing.Process(
+                target=run_region,
+                args=(region, self._inboxes[region.rid], self._outbox, self._task_loop, factions),
+                daemon=True
+            )
+            process.start()
+            self._processes.append(process)
+
+        return True
+
+    def route(self, message: tuple):
+        """Forward a message from one of the regions to its recipients"""
+        kind = message[0]
+
+        if kind == "handoff":
+            self._inboxes[self.partition.region_of(message[1]).rid].put(message)
+        elif kind == "border":
+            for rid in self.partition.neighbors(message[1]):
+                self._inboxes[rid].put(message)
+
+        return True
+
+    def run(self, factions: list[str]):
+        """Route messages and schedule new spawns until interrupted"""
+        next_spawn = time.monotonic() + SPAWN_FREQUENCY
+        try:
+            while True:
+                try:
+                    self.route(self._outbox.get(timeout=max(0.0, next_spawn - time.monotonic())))
+                except queue.Empty:
+                    pass
+
+                if time.monotonic() >= next_spawn:
+                    next_spawn += SPAWN_FREQUENCY
+                    rid = rng.get_rng("main").choice(self.partition.regions).rid
+                    self._inboxes[rid].put(("spawn", rng.get_rng("main").choice(factions)))
+        finally:
+            self.stop()
+
+    def stop(self):
+        for inbox in self._inboxes.values():
+            inbox.put(("stop",))
+
+        for process in self._processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+
+        return True
@@ -3,6 +3,7 @@ import uuid
 from dataclasses import dataclass, field
 
 from library.actor import Actor
+from library.rng import new_uuid
 from library.types import Location
 
 
@@ -18,9 +19,10 @@ class Squad:
     has_task: bool = False
     in_combat: bool = False
     is_looting: bool = False
+    grid_slot: int = field(default=-1, compare=False, repr=False)  # index in the grid square, maintained by MapGrid
 
     def __post_init__(self):
-        self.sid = uuid.uuid4().hex[-12:]
+        self.sid = new_uuid("squad").hex[-12:]
 
     def __str__(self):
         return f"{self.faction} squad (SID={self.sid}) ({self.num_actors()} {self.num_actors() > 1 and "actors" or "actor"})"
@@ -0,0 +1,260 @@
+import asyncio
+import json
+import struct
+import time
+
+from typing import Callable, Optional
+
+from config import STREAM_HOST, STREAM_PORT, STREAM_QUEUE_SIZE
+
+from library.grid import MapGrid
+from library.recorder import EventEncoder, encode, metadata, _HEADER, _RECORDS
+from library.recorder import SPAWN, MOVE, REMOVE, CORPSE, LOOTED, NAME
+from library.sharding import Region
+from library.types import Location
+
+# Frames are a payload length and a frame kind followed by the payload
+META, SNAPSHOT, DELTA = range(1, 4)
+_FRAME = struct.Struct("<IB")
+
+# Log messages are streamed only, so they get a variable-length record of their own
+LOG = 16
+_LOG = struct.Struct("<4sHHH")  # message type, x, y (0xFFFF if none), message length. Message follows
+_NO_SQUARE = 0xFFFF
+
+
+def frame(kind: int, payload: bytes = b""):
+    return _FRAME.pack(len(payload), kind) + payload
+
+
+def decode_records(payload: bytes):
+    """Iterate over records of a snapshot or delta frame as (time in seconds, record type, fields) tuples"""
+    offset, end = 0, len(payload)
+    while offset < end:
+        record_type, ms = _HEADER.unpack_from(payload, offset)
+        offset += _HEADER.size
+        if record_type == LOG:
+            msg_type, x, y, length = _LOG.unpack_from(payload, offset)
+            offset += _LOG.size
+            square = None if x == _NO_SQUARE else (x, y)
+            yield ms / 1000, LOG, (msg_type.rstrip(b"\0").decode(), square, payload[offset:offset + length].decode())
+            offset += length
+        else:
+            record = _RECORDS[record_type]
+            yield ms / 1000, record_type, record.unpack_from(payload, offset)
+            offset += record.size
+
+
+async def read_frame(reader: asyncio.StreamReader):
+    """Read a single frame, returns (frame kind, payload)"""
+    length, kind = _FRAME.unpack(await reader.readexactly(_FRAME.size))
+
+    return kind, await reader.readexactly(length)
+
+
+class _Client:
+    __slots__ = ("writer", "regions", "queue", "pending", "resyncs", "tasks")
+
+    def __init__(self, writer: Optional[asyncio.StreamWriter], queue_size: int):
+        self.writer = writer
+        self.regions = None  # subscribed regions, None for the whole grid
+        self.queue = asyncio.Queue(queue_size)  # frames waiting to be sent
+        self.pending = bytearray()  # records since the last flush
+        self.resyncs = 0
+        self.tasks = []
+
+    def sees(self, square: Optional[Location]):
+        return self.regions is None or (square is not None and any(r.contains(square) for r in self.regions))
+
+
+class StreamServer(EventEncoder):
+    """
+        Streams grid state to external viewers over TCP. Clients get run metadata and a snapshot of the grid,
+        followed by delta frames of the same records EventRecorder writes, plus log messages.
+        Records are batched once per event loop iteration and never wait on clients: a client that falls
+        STREAM_QUEUE_SIZE frames behind has its backlog replaced with a fresh snapshot.
+        Clients can send a length-prefixed JSON message {"regions": [[x_min, y_min, x_max, y_max], ...]} to only
+        receive updates for parts of the grid, null subscribes to the whole grid again
+    """
+
+    def __init__(
+        self, grid: MapGrid, host: str = STREAM_HOST, port: int = STREAM_PORT, queue_size: int = STREAM_QUEUE_SIZE,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        super().__init__(clock)
+        self._grid = grid
+        self._host = host
+        self._port = port
+        self._queue_size = queue_size
+        self._server = None
+        self._clients = []
+        self._entities = {}  # record id -> squad or corpse on the grid
+        self._positions = {}  # record id -> square
+        self._flushing = False
+        self._last_placed = None
+
+    @property
+    def port(self):
+        """Port the server is listening on, useful when started on port 0"""
+        return self._server.sockets[0].getsockname()[1] if self._server is not None else self._port
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self._host, self._port)
+        self._grid.add_listener(self)
+
+        return True
+
+    async def stop(self):
+        self._grid.remove_listener(self)
+        for client in list(self._clients):
+            self._drop(client)
+
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+        return True
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        client = _Client(writer, self._queue_size)
+        self._clients.append(client)
+        client.queue.put_nowait(frame(META, json.dumps(metadata()).encode()))
+        client.queue.put_nowait(self._snapshot(client))
+        client.tasks.append(asyncio.create_task(self._send(client)))
+
+        try:
+            while True:
+                _, payload = await read_frame(reader)
+                regions = json.loads(payload).get("regions")
+                client.regions = None if regions is None else [Region(i, *bounds) for i, bounds in enumerate(regions)]
+                self._resync(client)
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError, TypeError):
+            pass
+        finally:
+            self._drop(client)
+
+    async def _send(self, client: _Client):
+        try:
+            while True:
+                client.writer.write(await client.queue.get())
+                await client.writer.drain()
+        except ConnectionError:
+            self._drop(client)
+
+    def _drop(self, client: _Client):
+        if client not in self._clients:
+            return False
+
+        self._clients.remove(client)
+        for task in client.tasks:
+            task.cancel()
+
+        if client.writer is not None:
+            client.writer.close()
+
+        return True
+
+    def _resync(self, client: _Client):
+        """Replace everything the client hasn't received yet with a fresh snapshot"""
+        while not client.queue.empty():
+            client.queue.get_nowait()
+
+        client.pending.clear()
+        client.queue.put_nowait(self._snapshot(client))
+        client.resyncs += 1
+
+    def _snapshot(self, client: _Client):
+        """Snapshot frame of squads and corpses visible to a client, entities get record ids if they don't have one yet"""
+        self.flush()
+        ms = int(self._clock() * 1000)
+        records = [encode(NAME, ms, name_id, name.encode()) for name, name_id in self._names.items()]
+        for square, (squads, corpses) in self._grid.get_grid().items():
+            if not client.sees(square):
+                continue
+
+            for squad in squads:
+                record_id = self._squads.get(squad.sid)
+                if record_id is None:
+                    record_id = self._squads[squad.sid] = self._new_id()
+                    self._entities[record_id] = squad
+                    self._positions[record_id] = square
+
+                records.append(encode(SPAWN, ms, record_id, self._factions[squad.faction], *square, squad.num_actors(), squad.sid.encode()))
+
+            for corpse in corpses:
+                record_id = self._corpses.get(id(corpse))
+                if record_id is None:
+                    record_id = self._corpses[id(corpse)] = self._new_id()
+                    self._entities[record_id] = corpse
+                    self._positions[record_id] = square
+
+                records.append(encode(CORPSE, ms, record_id, self._factions[corpse.faction], *square))
+
+        return frame(SNAPSHOT, b"".join(records))
+
+    def _write(self, record_type: int, *fields):
+        ms = int(self._clock() * 1000)
+        record = encode(record_type, ms, *fields)
+
+        if record_type == NAME:
+            self._publish(record, None, everyone=True)  # task names are needed to decode task records anywhere
+        elif record_type == MOVE:
+            square, new_square = self._positions.get(fields[0]), (fields[1], fields[2])
+            self._positions[fields[0]] = new_square
+            squad = self._entities[fields[0]]
+            for client in self._clients:
+                if client.sees(square):
+                    client.pending += record  # clients see squads leaving their regions as well
+                elif client.sees(new_square):
+                    client.pending += encode(SPAWN, ms, fields[0], self._factions[squad.faction], *new_square, squad.num_actors(), squad.sid.encode())
+
+            self._schedule_flush()
+        elif record_type in (SPAWN, CORPSE):
+            square = self._positions[fields[0]] = (fields[2], fields[3])
+            self._entities[fields[0]] = self._last_placed
+            self._publish(record, square)
+        elif record_type in (REMOVE, LOOTED):
+            self._entities.pop(fields[0], None)
+            self._publish(record, self._positions.pop(fields[0], None))
+        else:
+            self._publish(record, self._positions.get(fields[0]))
+
+    def _publish(self, record: bytes, square: Optional[Location], everyone: bool = False):
+        for client in self._clients:
+            if everyone or client.sees(square):
+                client.pending += record
+
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._clients and not self._flushing:
+            self._flushing = True
+            asyncio.get_running_loop().call_soon(self._flush_frames)
+
+    def _flush_frames(self):
+        """Send records batched during this event loop iteration"""
+        self._flushing = False
+        self.flush()
+        for client in self._clients:
+            if not client.pending:
+                continue
+
+            try:
+                client.queue.put_nowait(frame(DELTA, bytes(client.pending)))
+                client.pending.clear()
+            except asyncio.QueueFull:
+                self._resync(client)
+
+    def _on_place(self, entity, square):
+        self._last_placed = entity  # SPAWN and CORPSE records only carry ids
+        super()._on_place(entity, square)
+
+    def _on_log(self, msg_type: str, message: str, square: Optional[Location]):
+        if not self._clients:
+            return
+
+        x, y = square if square else (_NO_SQUARE, _NO_SQUARE)
+        text = message.encode()
+        record = _HEADER.pack(LOG, int(self._clock() * 1000)) + _LOG.pack(msg_type.encode(), x, y, len(text)) + text
+        self._publish(record, square, everyone=square is None)
@@ -1,31 +1,59 @@
 import asyncio
-import random
 
-from typing import Awaitable, Optional
+from typing import Generator, Optional
 
 import config
 
 from library.actor import Actor
 from library.grid import MapGrid
+from library.path import Path
+from library.rng import get_rng
 from library.squad import Squad
 from library.types import Location
 
 
-async def move_to(grid: MapGrid, squad: Squad, dest: Location):
-    """Helper function to handle square-by-square movement"""
+async def run_step(step: Generator):
+    """
+        Run a single task step on the event loop.
+        Steps are generators that yield either a delay in seconds or a future to wait for (its result is sent back)
+    """
+    result, error = None, None
+    try:
+        while True:
+            request = step.send(result) if error is None else step.throw(error)
+            result, error = None, None
+            try:
+                if isinstance(request, (int, float)):
+                    await asyncio.sleep(request)
+                else:
+                    result = await request
+            except Exception as e:
+                error = e
+    except StopIteration as e:
+        return e.value
+
+
+def travel(grid: MapGrid, squad: Squad, dest: Location, resume: Optional[tuple] = None):
+    """
+        Step helper to handle square-by-square movement, use with "yield from".
+        In sharded mode resume describes the task that the region owning the destination should continue
+    """
 
     if not squad.actors:
         grid.remove(squad)
         return False
 
-    await asyncio.sleep(config.TRAVEL_DURATION)
+    yield config.TRAVEL_DURATION
     # interrupt movement for more important tasks
     if squad.in_combat or squad.is_looting:
         return False
 
-    grid.remove(squad)
-    squad.location = dest
-    grid.place(squad, dest)
+    # squad is crossing the region border, the rest of the task is up to the region that owns the square
+    if not grid.owns(dest):
+        grid.hand_off(squad, dest, resume)
+        return False
+
+    grid.move(squad, squad.location, dest)
 
     for actor in squad.actors:
         actor.location = dest
@@ -33,27 +61,84 @@ async def move_to(grid: MapGrid, squad: Squad, dest: Location):
     return True
 
 
+async def move_to(grid: MapGrid, squad: Squad, dest: Location, resume: Optional[tuple] = None):
+    """Helper function to handle square-by-square movement"""
+    return await run_step(travel(grid, squad, dest, resume))
+
+
+def find_path(grid: MapGrid, squad: Squad, dest: Location):
+    """
+        Step helper to find a path for a squad, use with "yield from". Searches run off the event loop unless
+        PATHFINDING_EXECUTOR is "inline". Returns None if there's no path or the squad died or got into a fight meanwhile
+    """
+    if config.PATHFINDING_EXECUTOR == "inline":
+        return grid.pathfinder.create_path(squad.location, dest)
+
+    return (yield grid.pathfinder.create_path_async(squad.location, dest, cancelled=lambda: not squad.actors or squad.in_combat))
+
+
+def travel_offline(grid: MapGrid, squad: Squad, dest: Location, resume: Optional[tuple] = None):
+    """
+        Step helper for squads away from the observer, use with "yield from". Squad jumps from cluster to cluster,
+        taking as long as walking the distance would, and fights encounters on the way (see LevelOfDetail).
+        Returns None if the squad has to be simulated square by square instead, i.e.: it has entered the online area
+    """
+    route = grid.lod.route(squad.location, dest)
+    if route is None:
+        return None
+
+    for square in route:
+        if not squad.actors:
+            grid.remove(squad)
+            return False
+
+        yield grid.pathfinder.chebyshev_distance(squad.location, square) * config.TRAVEL_DURATION
+        if squad.in_combat or squad.is_looting:
+            return False
+
+        if not grid.owns(square):
+            grid.hand_off(squad, square, resume)
+            return False
+
+        grid.move(squad, squad.location, square)
+        for actor in squad.actors:
+            actor.location = square
+
+        grid.lod.hops += 1
+        if grid.lod.is_online(square):
+            return None
+
+        if (rival := grid.lod.find_rival(squad)) is not None:
+            grid.lod.encounters += 1
+            CombatTask.resolve(grid, squad, rival, CombatTask.pick_winner(squad, rival))
+            if not squad.actors:
+                return False
+
+    return True
+
+
 class Task:
     """Base class for all tasks"""
 
-    _steps: list[Awaitable]  # can chain multiple steps to create more complex tasks
+    _steps: list[Generator]  # can chain multiple steps to create more complex tasks
 
     async def execute(self):
         """Execute steps in order and aggregate results"""
         res = []
         while self._steps:
-            res.append(await self._steps.pop(0))
+            res.append(await run_step(self._steps.pop(0)))
 
         return res
 
     def get_steps(self):
         return self._steps
 
-    def award_exp(self, squad: Squad):
+    @staticmethod
+    def award_exp(squad: Squad):
         """Award exp for task completion"""
         if config.FACTIONS[squad.faction]["can_gain_exp"]:
             for actor in squad.actors:
-                actor.gain_exp(random.randint(100, 300))
+                actor.gain_exp(get_rng("tasks").randint(100, 300))
                 actor.rank_up()
 
         return True
@@ -65,24 +150,28 @@ class CombatTask(Task):
     def __init__(self, grid: MapGrid, left: Squad, right: Squad):
         self._steps = [self._run(grid, left, right)]
 
-    async def _run(self, grid: MapGrid, left: Squad, right: Squad):
-
+    @staticmethod
+    def pick_winner(left: Squad, right: Squad):
         left_firepower = sum([a.experience for a in left.actors]) * config.FACTIONS[left.faction]["relative_firepower"]
         right_firepower = sum([a.experience for a in right.actors]) * config.FACTIONS[right.faction]["relative_firepower"]
 
         # determine "winning" squad, weighted by firepower.
         # More squad members with more experience + higher relative firepower = higher overall power
-        winner = random.choices([left, right], weights=[left_firepower, right_firepower])[0]
+        return get_rng("combat").choices([left, right], weights=[left_firepower, right_firepower])[0]
+
+    @classmethod
+    def resolve(cls, grid: MapGrid, left: Squad, right: Squad, winner: Squad):
+        """Apply combat outcome: casualties, corpses and exp for the winner"""
 
         def biased_outcome(low, high, inverted=False):
             """Generate a random number of losses, with bias towards a specific end of the range"""
-            bias = inverted and 1 - (random.random() ** 3.0) or random.random() ** 3.0
+            bias = inverted and 1 - (get_rng("combat").random() ** 3.0) or get_rng("combat").random() ** 3.0
             return round(low + (high - low) * bias)
 
-        await asyncio.sleep(config.COMBAT_DURATION)
-
+        casualties = []
         for squad in (left, right):
             losses = biased_outcome(0, squad.num_actors(), squad is not winner)
+            casualties.append(losses)
 
             msg = f"{squad} {losses and f"lost {losses} {losses > 1 and "men" or "man"}" or "took no casualties"} in combat"
             if losses == squad.num_actors():
@@ -91,8 +180,7 @@ class CombatTask(Task):
             grid.add_log_msg("CMBT", msg, squad.location)
 
             for actor in squad.actors[:losses]:
-                grid.place(actor, squad.location)  # place actor "corpse" for future looting
-                squad.remove_actor(actor)
+                grid.kill(squad, actor)
 
             if not squad.actors:
                 grid.remove(squad)
@@ -100,10 +188,17 @@ class CombatTask(Task):
         left.in_combat = False
         right.in_combat = False
 
-        self.award_exp(winner)
+        grid.emit("combat", left, right, winner, *casualties)
+        cls.award_exp(winner)
 
         return True
 
+    def _run(self, grid: MapGrid, left: Squad, right: Squad):
+        winner = self.pick_winner(left, right)
+        yield config.COMBAT_DURATION
+
+        return self.resolve(grid, left, right, winner)
+
 
 class MoveTask(Task):
     """Handles movement, duh"""
@@ -111,26 +206,48 @@ class MoveTask(Task):
     def __init__(self, grid: MapGrid, squad: Squad, dest: Optional[Location] = None):
         # generate random destination if it was not specified
         if dest is None:
-            while (dest := (random.randint(0, config.GRID_X_SIZE - 1), random.randint(0, config.GRID_Y_SIZE - 1))) in grid.get_obstacles(): pass
+            dest = grid.get_random_cell(get_rng("tasks"))
 
         self._steps = [self._run(grid, squad, dest)]
 
-    async def _run(self, grid: MapGrid, squad: Squad, dest: Location):
+    def _run(self, grid: MapGrid, squad: Squad, dest: Location):
+
+        if dest is None:  # map has no walkable squares
+            return False
 
         if squad.location == dest:  # already there
             return True
 
-        path = grid.pathfinder.create_path(squad.location, dest)
+        if grid.lod is not None and not grid.lod.is_online(squad.location):
+            squad.has_task = True
+            moved = yield from travel_offline(grid, squad, dest, ("move", dest))
+            if moved is not None:
+                squad.has_task = False
+                if moved:
+                    self.award_exp(squad)
+
+                return moved
+
+            # squad has entered the online area, the rest of the way is simulated square by square
+            if squad.location == dest:
+                squad.has_task = False
+                return True
+
+        # busy while waiting for the path as well
+        squad.has_task = True
+        path = yield from find_path(grid, squad, dest)
         if path is None:
+            squad.has_task = False
             return False
 
+        path = Path(squad.location, path)
+
         grid.add_log_msg("MOVE", f"{squad} is moving to {dest}", squad.location)
-        squad.has_task = True
 
         while path:
-            next_square = path.pop(0)
+            next_square = path.pop()
             # interrupt task if movement has failed
-            if not await move_to(grid, squad, next_square): break
+            if not (yield from travel(grid, squad, next_square, ("move", dest))): break
 
         squad.has_task = False
         self.award_exp(squad)
@@ -151,16 +268,16 @@ class HuntArtifactsTask(Task):
         else:
             self._steps = []  # map does not support artifact fields
 
-    async def _run(self, grid: MapGrid, squad: Squad):
+    def _run(self, grid: MapGrid, squad: Squad):
         grid.add_log_msg("ARTI", f"{squad} is hunting for artifacts", squad.location)
 
         squad.has_task = True
-        await asyncio.sleep(config.ARTIFACT_HUNT_DURATION)
+        yield config.ARTIFACT_HUNT_DURATION
 
         if squad.in_combat:
             return False
 
-        losses = random.randint(0, squad.num_actors() // 2)
+        losses = get_rng("tasks").randint(0, squad.num_actors() // 2)
         if losses:
             grid.add_log_msg("ARTI",
                 f"{squad} has lost {losses} {losses > 1 and "men" or "man"} while hunting for artifacts",
@@ -168,11 +285,10 @@ class HuntArtifactsTask(Task):
             )
 
             for actor in squad.actors[:losses]:
-                grid.place(actor, squad.location)
-                squad.remove_actor(actor)
+                grid.kill(squad, actor)
 
         if squad.actors:
-            random.choice(squad.actors).loot_value += random.randint(100, 500)
+            get_rng("tasks").choice(squad.actors).loot_value += get_rng("tasks").randint(100, 500)
 
         self.award_exp(squad)
         squad.has_task = False
@@ -192,7 +308,7 @@ class TradeTask(Task):
         else:
             self._steps = []  # map does not support traders
 
-    async def _run(self, grid: MapGrid, squad: Squad):
+    def _run(self, grid: MapGrid, squad: Squad):
 
         squad.has_task = True
         grid.add_log_msg("TRDE", f"{squad} is selling habar", squad.location)
@@ -200,7 +316,7 @@ class TradeTask(Task):
         for actor in squad.actors:
             actor.loot_value //= 2  # "sell" half of loot
 
-        await asyncio.sleep(config.TRADE_DURATION)
+        yield config.TRADE_DURATION
         squad.has_task = False
 
         return True
@@ -211,14 +327,14 @@ class IdleTask(Task):
 
     def __init__(self, grid: MapGrid, squad: Squad, duration: Optional[int] = None):
         if duration is None:
-            duration = random.randint(config.MIN_IDLE_DURATION, config.MAX_IDLE_DURATION)
+            duration = get_rng("tasks").randint(config.MIN_IDLE_DURATION, config.MAX_IDLE_DURATION)
 
         self._steps = [self._run(grid, squad, duration)]
 
-    async def _run(self, grid: MapGrid, squad: Squad, duration: int):
+    def _run(self, grid: MapGrid, squad: Squad, duration: int):
         grid.add_log_msg("IDLE", f"{squad} is waiting for {duration} seconds", squad.location)
         squad.has_task = True
-        await asyncio.sleep(duration)
+        yield duration
         squad.has_task = False
 
         return True
@@ -230,7 +346,7 @@ class LootTask(Task):
     def __init__(self, grid: MapGrid, squad: Squad, actor: Actor):
         self._steps = [self._run(grid, squad, actor)]
 
-    async def _run(self, grid: MapGrid, squad: Squad, actor: Actor):
+    def _run(self, grid: MapGrid, squad: Squad, actor: Actor):
         if actor.loot_value is None:
             return False  # already looted
 
@@ -245,11 +361,12 @@ class LootTask(Task):
 
         actor_loot_value = actor.loot_value
         actor.loot_value = None
+        grid.corpses.mark_looted(actor)
 
-        await asyncio.sleep(config.LOOT_DURATION)
-        grid.remove(actor)
+        yield config.LOOT_DURATION
+        grid.corpses.remove(actor)
 
-        random.choice(squad.actors).loot_value += actor_loot_value  # award loot to a random actor in a squad
+        get_rng("tasks").choice(squad.actors).loot_value += actor_loot_value  # award loot to a random actor in a squad
 
         squad.is_looting = False
 
@@ -259,8 +376,9 @@ class LootTask(Task):
 class HuntSquadTask(Task):
     """Hunt another squad for bounty"""
 
-    def __init__(self, grid: MapGrid, squad: Squad):
-        target = grid.get_squad_in_vicinity(squad.location, config.FACTIONS[squad.faction]["hostile"], max_actors=squad.num_actors())
+    def __init__(self, grid: MapGrid, squad: Squad, target: Optional[Squad] = None):
+        if target is None:
+            target = grid.get_squad_in_vicinity(squad.location, config.FACTIONS[squad.faction]["hostile"], max_actors=squad.num_actors())
 
         if target:
             grid.add_log_msg("HUNT", f"{squad} is hunting {target} at {target.location}", squad.location)
@@ -268,26 +386,33 @@ class HuntSquadTask(Task):
         else:
             self._steps = []
 
-    async def _run(self, grid: MapGrid, squad: Squad, target: Squad):
-        path = grid.pathfinder.create_path(squad.location, target.location)
+    def _run(self, grid: MapGrid, squad: Squad, target: Squad):
+        squad.has_task = True
+        path = yield from find_path(grid, squad, target.location)
         if not path:
+            squad.has_task = False
             return False
 
-        squad.has_task = True
+        path = Path(squad.location, path)
         old_location = target.location
+        pursuit = None  # incremental search, only set up once the target starts moving
 
         while squad.location != target.location and path:
-            next_square = path.pop(0)
-            await move_to(grid, squad, next_square)
+            next_square = path.pop()
+            # interrupt the hunt if movement has failed
+            if not (yield from travel(grid, squad, next_square, ("hunt", target.sid))): break
 
             # target has moved
             if target.location != old_location:
                 old_location = target.location
-                path = grid.pathfinder.create_path(squad.location, target.location)
+                if pursuit is None:
+                    pursuit = grid.pathfinder.pursue(squad.location, target.location)
+                path = Path(squad.location, pursuit.path(squad.location, target.location) or [])
 
-        grid.add_log_msg("HUNT", f"{squad} has found it's target", target.location)
+        if squad.location == target.location:
+            grid.add_log_msg("HUNT", f"{squad} has found it's target", target.location)
+            self.award_exp(squad)
 
-        self.award_exp(squad)
         squad.has_task = False
 
         return True
@@ -1,87 +1,182 @@
 import asyncio
 import os
-import random
+import time
 
-from library import MapGrid, CombatTask, IdleTask, MoveTask, LootTask, HuntArtifactsTask, TradeTask, HuntSquadTask
-from config import FACTIONS, SPAWN_FREQUENCY, MIN_FACTION_SQUADS, MAX_FACTION_SQUADS, LOOT_SELLING_THRESHOLD
+from typing import Callable
+
+from library import MapGrid, CombatTask, IdleTask, MoveTask, LootTask, HuntArtifactsTask, TradeTask, HuntSquadTask, Coordinator
+from library import EventRecorder, EventReplayer, VirtualClockEventLoop, TaskEngine, StreamServer, rng
+from config import FACTIONS, SPAWN_FREQUENCY, MIN_FACTION_SQUADS, MAX_FACTION_SQUADS, LOOT_SELLING_THRESHOLD, SHARD_REGIONS
+from config import SEED, SIMULATION_SPEED, RECORD_FILE, REPLAY_FILE, TASK_ENGINE, STREAM_PORT
+
+
+def assign_tasks(grid: MapGrid, square, start: Callable):
+    """Make decisions for squads on a given square. Tasks are passed to start along with the squads they occupy"""
+    squadlist = grid.get_grid().get(square, ([], []))[0]
+
+    # Do some ghost-busting. Squads with no actors are considered dead and shouldn't be on the grid
+    for squad in [squad for squad in squadlist if not squad.actors]:
+        grid.remove(squad, square)
+
+    # Pair up hostile squads not fighting anyone else yet. Offline squads fight encounters on the move instead
+    while (grid.lod is None or grid.lod.is_online(square)) and (pair := grid.get_hostile_pair(square)):
+        squad, nxt = pair
+
+        # Set flags to prevent double-tasking
+        squad.in_combat = True
+        nxt.in_combat = True
+
+        grid.emit("task", squad, CombatTask.__name__)
+        grid.emit("task", nxt, CombatTask.__name__)
+        start(CombatTask(grid, squad, nxt), squad, nxt)
+
+    for squad in squadlist:
+        # Prevent looting mid-combat
+        if squad.in_combat:
+            continue
+
+        # Loot if there are bodies in the same square. Prevents movement
+        if grid.corpses.count_lootable(square) and FACTIONS[squad.faction]["can_loot"]:
+            # 1 guy loots 1 corpse at a time
+            for actor in grid.corpses.get_lootable(square, len(squad.actors)):
+                grid.emit("task", squad, LootTask.__name__)
+                start(LootTask(grid, squad, actor), squad)
+        else:
+            # Can't task a squad already doing something else
+            if squad.is_busy():
+                continue
+
+            potential_tasks = [IdleTask, MoveTask]
+            if sum(actor.loot_value for actor in squad.actors) >= LOOT_SELLING_THRESHOLD and FACTIONS[squad.faction]["can_trade"]:
+                potential_tasks.append(TradeTask)
+
+            if FACTIONS[squad.faction]["can_hunt_artifacts"]:
+                potential_tasks.append(HuntArtifactsTask)
+
+            if FACTIONS[squad.faction]["can_hunt_squads"]:
+                potential_tasks.append(HuntSquadTask)
+
+            # These tasks are the same priority and can be randomly selected
+            # New task types can go here as well
+            new_task = rng.get_rng("main").choice(potential_tasks)
+            grid.emit("task", squad, new_task.__name__)
+            start(new_task(grid, squad), squad)
+
+    return True
 
 
 async def main(loop, grid: MapGrid):
-    tasks = []
+    """
+        Task loop. Instead of rescanning the whole grid, only squares whose occupancy has changed
+        and squares of squads that have just completed a task are evaluated
+    """
+    tasks = set()  # event loop only keeps weak references to running tasks
+    engine = TaskEngine(loop) if TASK_ENGINE == "wheel" else None
+    wakeup = asyncio.Event()
+    last_refresh = None
+    grid.corpses.clock = loop.time
+
+    def on_done(squads):
+        for squad in squads:
+            grid.mark_dirty(squad.location)
+        wakeup.set()
+
+    def start(task, *squads):
+        if engine is not None:
+            engine.submit(task, lambda _: on_done(squads))
+        else:
+            t = loop.create_task(task.execute())
+            tasks.add(t)
+            t.add_done_callback(lambda _: (tasks.discard(t), on_done(squads)))
 
     while True:
+        # Redraw at most once a second, the loop can wake up a lot more often
+        if last_refresh is None or loop.time() - last_refresh >= 1:
+            grid.refresh()
+            last_refresh = loop.time()
+
+        grid.corpses.expire()
+
+        for square in grid.pop_dirty_squares():
+            assign_tasks(grid, square, start)
+
+        # Squares marked dirty by movement are picked up on timeout, completions wake the loop right away
+        wakeup.clear()
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout=1)
+        except TimeoutError:
+            pass
+
+
+def run_sharded():
+    """Run every region of the grid in its own process"""
+    squads = [f for f in FACTIONS for _ in range(rng.get_rng("main").randint(MIN_FACTION_SQUADS, MAX_FACTION_SQUADS))]
+    rng.get_rng("main").shuffle(squads)
+
+    print(f"[INFO] STARTING SHARDED SIMULATION WITH {SHARD_REGIONS[0]}x{SHARD_REGIONS[1]} REGIONS...")
+    coordinator = Coordinator(main, *SHARD_REGIONS)
+    coordinator.start(squads)
+
+    try:
+        coordinator.run(list(FACTIONS.keys()))
+    except KeyboardInterrupt:
+        print("[INFO] Shutting down, please wait...")
+
+
+def run_replay():
+    """Rebuild grid state from a recorded run, redrawing it every second of recorded time"""
+    grid = MapGrid()
+    replayer = EventReplayer(REPLAY_FILE)
+    grid.add_log_msg("INFO", f" Replaying {REPLAY_FILE} (seed={replayer.metadata['seed']}, map={replayer.metadata['map']})...")
+
+    def on_frame(_):
         grid.refresh()
+        if SIMULATION_SPEED:
+            time.sleep(1 / SIMULATION_SPEED)
+
+    started = time.perf_counter()
+    count = replayer.replay(grid, on_frame)
+    grid.add_log_msg("INFO", f" Replayed {count} events in {time.perf_counter() - started:.2f} seconds")
+    grid.refresh()
 
-        for square, entities in grid.get_grid().items():
-            squadlist = entities[0]
-            actorlist = entities[1]
-
-            for index, squad in enumerate(squadlist):
-                # Do some ghost-busting. Squads with no actors are considered dead and shouldn't be on the grid
-                if not squad.actors:
-                    grid.remove(squad, square)
-                    continue
-
-                # Seek nearby hostile squads
-                j = index + 1
-                while j < len(squadlist):
-                    nxt = squadlist[j]
-                    # not hostile to each other OR squad already dead OR is fighting someone else
-                    if nxt.faction not in FACTIONS[squad.faction]["hostile"]\
-                    or not nxt.actors\
-                    or (squad.in_combat or nxt.in_combat):
-                        j += 1
-                        continue
-
-                    # Set flags to prevent double-tasking
-                    squad.in_combat = True
-                    nxt.in_combat = True
-
-                    tasks.append(loop.create_task(CombatTask(grid, squad, nxt).execute()))
-                    break
-
-                # Prevent looting mid-combat
-                if squad.in_combat:
-                    continue
-
-                # Loot if there are bodies in the same square. Prevents movement
-                if actorlist and FACTIONS[squad.faction]["can_loot"]:
-                    max_lootable_corpses = min(len(actorlist), len(squad.actors))  # 1 guy loots 1 corpse at a time
-                    for actor in filter(lambda x: x.loot_value is not None, actorlist[:max_lootable_corpses]):
-                        tasks.append(loop.create_task(LootTask(grid, squad, actor).execute()))
-                else:
-                    # Can't task a squad already doing something else
-                    if squad.is_busy():
-                        continue
-
-                    potential_tasks = [IdleTask, MoveTask]
-                    if sum(actor.loot_value for actor in squad.actors) >= LOOT_SELLING_THRESHOLD and FACTIONS[squad.faction]["can_trade"]:
-                        potential_tasks.append(TradeTask)
-
-                    if FACTIONS[squad.faction]["can_hunt_artifacts"]:
-                        potential_tasks.append(HuntArtifactsTask)
-
-                    if FACTIONS[squad.faction]["can_hunt_squads"]:
-                        potential_tasks.append(HuntSquadTask)
-
-                    # These tasks are the same priority and can be randomly selected
-                    # New task types can go here as well
-                    new_task = random.choice(potential_tasks)
-                    tasks.append(loop.create_task(new_task(grid, squad).execute()))
-
-        _, running = await asyncio.wait(tasks, timeout=1)
-        tasks = list(running)
-
-        grid.cleanup()
 
 if __name__ == "__main__":
 
+    if REPLAY_FILE is not None:
+        run_replay()
+        raise SystemExit
+
+    rng.seed(SEED)
+
+    if SHARD_REGIONS != (1, 1):
+        run_sharded()
+        raise SystemExit
+
+    # Seeded runs use simulated time, so task interleaving does not depend on real timing
+    if SEED is not None:
+        main_loop = VirtualClockEventLoop(SIMULATION_SPEED)
+    elif os.name == "nt":
+        main_loop = asyncio.new_event_loop()
+    else:
+        import uvloop
+        main_loop = uvloop.new_event_loop()
+
     map_grid = MapGrid()
-    map_grid.add_log_msg("INFO", " Starting simulation...")
+    map_grid.add_log_msg("INFO", f" Starting simulation{SEED is not None and f" (seed={SEED})" or ""}...")
+
+    recorder = None
+    if RECORD_FILE is not None:
+        recorder = EventRecorder(RECORD_FILE, clock=main_loop.time, seed=SEED)
+        map_grid.add_listener(recorder)
+
+    if STREAM_PORT is not None:
+        stream_server = StreamServer(map_grid, clock=main_loop.time)
+        main_loop.run_until_complete(stream_server.start())
+        map_grid.add_log_msg("INFO", f" Streaming grid state on port {stream_server.port}")
 
     # Generate squads
     for f in FACTIONS:
-        num_squads = random.randint(MIN_FACTION_SQUADS, MAX_FACTION_SQUADS)
+        num_squads = rng.get_rng("main").randint(MIN_FACTION_SQUADS, MAX_FACTION_SQUADS)
         for _ in range(num_squads):
             map_grid.spawn(f)
 
@@ -89,13 +184,7 @@ if __name__ == "__main__":
         # Spawn a new random squad every X seconds
         while True:
             await asyncio.sleep(SPAWN_FREQUENCY)
-            grid.spawn(random.choice(list(FACTIONS.keys())))
-
-    if os.name == "nt":
-        main_loop = asyncio.new_event_loop()
-    else:
-        import uvloop
-        main_loop = uvloop.new_event_loop()
+            grid.spawn(rng.get_rng("main").choice(list(FACTIONS.keys())))
 
     main_task = main_loop.create_task(main(main_loop, map_grid))
     main_loop.create_task(scheduled_spawner(map_grid))
@@ -107,3 +196,6 @@ if __name__ == "__main__":
     finally:
         main_task.cancel()
         main_loop.stop()
+        map_grid.pathfinder.shutdown()
+        if recorder is not None:
+            recorder.close()
@@ -0,0 +1,34 @@
+import asyncio
+import time
+
+from library import VirtualClockEventLoop
+
+
+def test_virtual_clock():
+    loop = VirtualClockEventLoop()
+    order = []
+
+    async def sleeper(name, duration):
+        await asyncio.sleep(duration)
+        order.append((name, loop.time()))
+
+    async def run():
+        await asyncio.gather(sleeper("slow", 3600), sleeper("fast", 10), sleeper("medium", 60))
+
+    started = time.perf_counter()
+    loop.run_until_complete(run())
+    loop.close()
+
+    assert time.perf_counter() - started < 1, "Virtual clock should not wait in real time"
+    assert order == [("fast", 10), ("medium", 60), ("slow", 3600)], "Timers should fire in order at simulated time"
+
+
+def test_virtual_clock_speed():
+    loop = VirtualClockEventLoop(speed=100)
+
+    started = time.perf_counter()
+    loop.run_until_complete(asyncio.sleep(10))
+    loop.close()
+
+    assert time.perf_counter() - started >= 0.09, "Clock speed should be relative to real time"
+    assert loop.time() == 10, "Simulated time should advance by the sleep duration"
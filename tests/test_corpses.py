@@ -0,0 +1,43 @@
+from library import MapGrid, Actor, CorpseRegistry
+
+
+def test_corpse_expiry():
+    now = [0]
+    grid = MapGrid()
+    corpses = CorpseRegistry(grid, lifetime=60, clock=lambda: now[0])
+
+    first = Actor("stalker", (1, 1))
+    corpses.add(first, (1, 1))
+    now[0] = 30
+    corpses.add(Actor("bandit", (1, 1)), (1, 1))
+
+    assert corpses.count_lootable((1, 1)) == 2, "Both corpses should be lootable"
+    assert corpses.get_lootable((1, 1), 1) == [first], "Oldest corpse should be looted first"
+
+    now[0] = 60
+    assert corpses.expire() == 1, "Only the oldest corpse should decay"
+    assert len(grid.get_grid()[(1, 1)][1]) == 1, "Decayed corpse should be removed from the grid"
+
+    now[0] = 90
+    corpses.expire()
+    assert (1, 1) not in grid.get_grid(), "All corpses should decay eventually"
+    assert not corpses.count_lootable((1, 1)), "Decayed corpses should not be lootable"
+
+
+def test_corpse_limit():
+    grid = MapGrid()
+    corpses = CorpseRegistry(grid, limit=2)
+
+    actors = [Actor("stalker", (i, 1)) for i in range(3)]
+    for actor in actors:
+        corpses.add(actor, actor.location)
+
+    assert len(corpses) == 2, "Number of corpses should be capped"
+    assert (0, 1) not in grid.get_grid(), "Oldest corpse should be evicted"
+
+    corpses.mark_looted(actors[1])
+    assert not corpses.count_lootable((1, 1)), "Looted corpse should not be lootable"
+    assert len(grid.get_grid()[(1, 1)][1]) == 1, "Looted corpse should stay on the grid until removed"
+
+    corpses.remove(actors[1])
+    assert (1, 1) not in grid.get_grid(), "Removed corpse should leave the grid"
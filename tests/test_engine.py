@@ -0,0 +1,68 @@
+import asyncio
+
+from library import TimerWheel, TaskEngine, IdleTask, MoveTask, MapGrid, Squad, Actor, VirtualClockEventLoop
+
+
+def test_timer_wheel():
+    wheel = TimerWheel(resolution=1)
+
+    # Spread over all levels and the overflow heap
+    for when in [300000, 5, 70, 5000, 0]:
+        wheel.schedule(when, when)
+
+    assert len(wheel) == 5, "All timers should be pending"
+    assert wheel.next_tick() == 0, "Timer due now should be the next one"
+    assert wheel.advance(0) == [0], "Timer due now should fire right away"
+
+    assert wheel.next_tick() == 5, "Next timer should be found in the first level"
+    assert wheel.advance(4) == [], "No timers should fire early"
+
+    fired = []
+    while len(wheel):
+        fired.extend(wheel.advance(wheel.next_tick()))
+
+    assert fired == [5, 70, 5000, 300000], "Timers should fire in order after cascading down"
+
+
+def test_timer_wheel_rounding():
+    wheel = TimerWheel(resolution=0.1)
+
+    assert wheel.schedule("a", 0.30000000000000004) == 3, "Float error should not push a timer to the next tick"
+    assert wheel.schedule("b", 0.31) == 4, "Delays should be rounded up to the wheel resolution"
+
+
+def test_task_engine(monkeypatch):
+    monkeypatch.setattr('config.TRAVEL_DURATION', 1)
+    monkeypatch.setattr('library.pathfinder.PATHFINDING_MODE', 'simple')
+
+    loop = VirtualClockEventLoop()
+    engine = TaskEngine(loop)
+    grid = MapGrid()
+    done = []
+
+    idle = Squad("stalker", (1, 1))
+    idle.add_actor(Actor("stalker", (1, 1)))
+    grid.place(idle, (1, 1))
+
+    mover = Squad("stalker", (0, 0))
+    mover.add_actor(Actor("stalker", (0, 0)))
+    grid.place(mover, (0, 0))
+
+    engine.submit(IdleTask(grid, idle, 30), lambda results: done.append(("idle", loop.time())))
+    engine.submit(MoveTask(grid, mover, (3, 0)), lambda results: done.append(("move", loop.time())))
+
+    assert idle.has_task and mover.has_task, "Squads should be busy while their tasks are running"
+    assert len(engine) == 2, "Both tasks should be in progress"
+
+    loop.run_until_complete(_wait_for(loop, lambda: len(engine) == 0))
+    loop.close()
+
+    assert [name for name, _ in done] == ["move", "idle"], "Shorter task should complete first"
+    assert done[0][1] == 3 and done[1][1] == 30, "Tasks should complete at simulated time"
+    assert mover.location == (3, 0), "Squad should reach its destination"
+    assert not idle.has_task and not mover.has_task, "Squads should be released once their tasks are complete"
+
+
+async def _wait_for(loop, condition):
+    while not condition():
+        await asyncio.sleep(1)
@@ -0,0 +1,9 @@
+from library.factions import faction_bit, hostile_mask, iter_bits, FACTION_INDEX
+
+
+def test_hostility_mask():
+    assert hostile_mask("stalker") & faction_bit("bandit"), "Bandits should be hostile to stalkers"
+    assert not hostile_mask("stalker") & faction_bit("stalker"), "Stalkers should not be hostile to each other"
+
+    mask = faction_bit("mutant") | faction_bit("stalker")
+    assert list(iter_bits(mask)) == sorted([FACTION_INDEX["mutant"], FACTION_INDEX["stalker"]]), "Bits should be listed lowest first"
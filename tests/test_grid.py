@@ -1,4 +1,5 @@
-from library import MapGrid, Squad
+from config import FACTIONS, GRID_X_SIZE, GRID_Y_SIZE
+from library import MapGrid, Squad, Actor
 
 
 def test_grid_logger(monkeypatch):
@@ -32,6 +33,22 @@ def test_grid_spawner():
     assert squad.location == (5, 33), "Entity should have correct location set"
 
 
+def test_grid_random_spawn():
+    grid = MapGrid()
+    lower_x, lower_y, upper_x, upper_y = grid.get_spawn_area(FACTIONS["bandit"]["spawn_bias"])
+
+    for _ in range(200):
+        grid.spawn("bandit")
+
+    for square in grid.get_grid():
+        assert square not in grid.get_obstacles(), "Squads should not spawn on obstacles"
+        assert lower_x <= square[0] < upper_x and lower_y <= square[1] < upper_y, "Squads should spawn in the faction area"
+
+    for _ in range(200):
+        x, y = grid.get_random_cell()
+        assert 0 <= x < GRID_X_SIZE and 0 <= y < GRID_Y_SIZE, "Random squares should be within the grid"
+
+
 def test_grid_remove():
     grid = MapGrid()
     grid.spawn("stalker", (4, 22))
@@ -40,7 +57,6 @@ def test_grid_remove():
 
     squad = grid_dict[(4, 22)][0][0]
     grid.remove(squad)
-    grid.cleanup()
 
     assert (4, 22) not in grid_dict, "Square should be removed from the grid"
 
@@ -53,3 +69,62 @@ def test_grid_place():
 
     assert (3, 26) in grid_dict, "Square should be added to the grid"
     assert grid_dict[(3, 26)][0][0] is squad, "Square should contain correct entity"
+
+
+def test_grid_dirty_squares():
+    grid = MapGrid()
+    squad = Squad(faction="stalker", location=(3, 26))
+    grid.place(squad, (3, 26))
+
+    assert grid.pop_dirty_squares() == {(3, 26)}, "Placing an entity should mark the square dirty"
+    assert not grid.pop_dirty_squares(), "Dirty squares should be cleared once popped"
+
+    grid.remove(squad)
+    grid.mark_dirty((5, 5))
+    assert grid.pop_dirty_squares() == {(3, 26), (5, 5)}, "Removals and explicit marks should mark squares dirty"
+
+
+def test_grid_hostile_pair():
+    grid = MapGrid()
+
+    for faction in ("stalker", "stalker", "monolith"):
+        squad = Squad(faction=faction, location=(3, 26))
+        squad.add_actor(Actor(faction, (3, 26)))
+        grid.place(squad, (3, 26))
+
+    left, right = grid.get_hostile_pair((3, 26))
+    assert {left.faction, right.faction} == {"stalker", "monolith"}, "Only hostile squads should be paired"
+
+    left.in_combat = right.in_combat = True
+    assert grid.get_hostile_pair((3, 26)) is None, "Squads already in combat should not be paired"
+
+    grid.remove(right)
+    assert grid.get_hostile_pair((3, 26)) is None, "Friendly squads should not be paired"
+
+
+def test_grid_slots():
+    grid = MapGrid()
+    squads = [Squad(faction="stalker", location=(3, 26)) for _ in range(3)]
+    for squad in squads:
+        grid.place(squad, (3, 26))
+
+    grid.remove(squads[0])
+    squadlist = grid.get_grid()[(3, 26)][0]
+
+    assert len(squadlist) == 2 and squads[0] not in squadlist, "Squad should be removed from the square"
+    assert all(squadlist[s.grid_slot] is s for s in squadlist), "Remaining squads should keep valid slots"
+    assert not grid.remove(squads[0]), "Removing a squad twice should fail"
+
+    assert not grid.remove(squads[1], (10, 10)), "Removing from a wrong square should fail"
+    assert (10, 10) not in grid.get_grid(), "Missing squares should not be created on lookup"
+
+
+def test_grid_move():
+    grid = MapGrid()
+    squad = Squad(faction="stalker", location=(3, 26))
+    grid.place(squad, (3, 26))
+
+    assert grid.move(squad, (3, 26), (4, 26)), "Squad should be moved"
+    assert squad.location == (4, 26), "Squad location should be updated"
+    assert (3, 26) not in grid.get_grid(), "Empty square should be removed right away"
+    assert grid.get_grid()[(4, 26)][0] == [squad], "Squad should be placed on the destination square"
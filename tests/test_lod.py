@@ -0,0 +1,56 @@
+import pytest
+
+from library import MapGrid, Squad, Actor, MoveTask
+from library.lod import LevelOfDetail
+from library.tasks import run_step
+
+
+def _squad(grid, faction, square):
+    squad = Squad(faction, square)
+    squad.add_actor(Actor(faction, square))
+    grid.place(squad, square)
+
+    return squad
+
+
+def test_level_of_detail():
+    grid = MapGrid()
+    lod = LevelOfDetail(grid.pathfinder, radius=5, focus=(0, 0))
+    grid.add_listener(lod)
+
+    stalker = _squad(grid, "stalker", (80, 70))
+    monolith = _squad(grid, "monolith", (85, 75))
+    _squad(grid, "stalker", (86, 75))
+
+    assert lod.is_online((5, 5)) and not lod.is_online((6, 0)), "Squares within the radius should be online"
+    assert lod.find_rival(stalker) is monolith, "Hostile squad in the same cluster should be found"
+
+    grid.move(monolith, (85, 75), (95, 80))
+    assert lod.find_rival(stalker) is None, "Squads in other clusters should not be found"
+
+    route = lod.route((80, 70), (90, 45))
+    assert route[-1] == (90, 45), "Route should end at the destination"
+    assert len(route) == len(grid.pathfinder.route_clusters((80, 70), (90, 45))) - 1, "Route should stop once per cluster"
+
+
+@pytest.mark.asyncio
+async def test_offline_movement(monkeypatch):
+    monkeypatch.setattr('config.TRAVEL_DURATION', 0)
+    monkeypatch.setattr('library.grid.LOD_RADIUS', 5)
+    monkeypatch.setattr('library.lod.LOD_FOCUS', (0, 0))
+    grid = MapGrid()
+    moves = []
+    grid.add_listener(lambda event, *args: event == "place" and moves.append(args[1]))
+
+    squad = _squad(grid, "stalker", (80, 70))
+    moves.clear()
+    await run_step(MoveTask(grid, squad, (90, 45)).get_steps()[0])
+
+    assert squad.location == (90, 45), "Offline squad should reach its destination"
+    assert len(moves) == len(grid.lod.route((80, 70), (90, 45))), "Offline squad should move once per cluster"
+
+    moves.clear()
+    grid.lod.focus = (90, 45)
+    await run_step(MoveTask(grid, squad, (90, 47)).get_steps()[0])
+    assert squad.location == (90, 47), "Online squad should reach its destination"
+    assert len(moves) == 2, "Online squad should move square by square"
@@ -0,0 +1,31 @@
+from collections import deque
+
+from library.mapgen import generate_map
+
+
+def test_generate_map():
+    area_map = generate_map(60, 45, density=0.45, scale=4, pois=3, fields=2, traders=1, seed=1)
+    obstacles = area_map["obstacles"]
+
+    assert isinstance(obstacles, set), "Obstacles should be stored as a set, same as bundled maps"
+    assert len(area_map["pois"]) == 3 and len(area_map["fields"]) == 2 and len(area_map["traders"]) == 1, "Points should be placed"
+
+    points = area_map["pois"] + area_map["fields"] + area_map["traders"]
+    assert not set(points) & obstacles, "Points should be placed on walkable squares"
+    assert len(set(points)) == len(points), "Points should not overlap"
+
+    free = [(x, y) for x in range(60) for y in range(45) if (x, y) not in obstacles]
+    seen = {free[0]}
+    queue = deque([free[0]])
+    while queue:
+        x, y = queue.popleft()
+        for square in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            if 0 <= square[0] < 60 and 0 <= square[1] < 45 and square not in obstacles and square not in seen:
+                seen.add(square)
+                queue.append(square)
+
+    assert len(seen) == len(free), "Every walkable square should be reachable"
+
+
+def test_generate_map_seed():
+    assert generate_map(50, 40, seed=7) == generate_map(50, 40, seed=7), "Same seed should produce the same map"
@@ -0,0 +1,20 @@
+from library import Path
+
+
+def test_path():
+    squares = [(1, 1), (2, 2), (3, 3), (3, 4), (3, 5), (4, 5)]
+    path = Path((0, 0), squares)
+
+    assert len(path) == 6, "Path should have all squares"
+    assert list(path) == squares, "Path should expand to the original squares"
+    assert len(path._runs) == 9, "Straight stretches should be stored as single runs"
+
+    assert path.pop() == (1, 1), "First square should be popped"
+    assert path.pop() == (2, 2) and path.pop() == (3, 3), "Squares should be popped in order across runs"
+    assert list(path) == squares[3:], "Iteration should not consume the path"
+
+    while path:
+        last = path.pop()
+
+    assert last == (4, 5), "Path should end at the destination"
+    assert not Path((0, 0), []), "Empty path should be falsy"
@@ -1,6 +1,9 @@
+import asyncio
+import time
+
 import pytest
 
-from library import Pathfinder
+from library import Pathfinder, Pursuit
 
 
 @pytest.fixture
@@ -62,3 +65,129 @@ def test_create_hpa_path(pathfinder):
 
     path = pathfinder.create_hpa_path((0, 0), (10, 10), {(i, 5) for i in range(10)})
     assert path is None, "HPA result should be empty if there's no path"
+
+
+def test_pursuit(pathfinder):
+    obstacles = {(5, 5), (6, 6), (8, 8)}
+    pursuit = Pursuit(pathfinder, (0, 0), (9, 9), obstacles)
+
+    path = pursuit.path((0, 0), (9, 9))
+    assert len(path) == len(pathfinder.create_8way_astar_path((0, 0), (9, 9), obstacles)), "Pursuit path should be optimal"
+
+    path = pursuit.path(path[0], (9, 8))
+    assert path[-1] == (9, 8) and pursuit.searches == 1, "Small target moves should reuse the search"
+    assert not set(path) & obstacles, "Pursuit path should avoid obstacles"
+
+    path = pursuit.path(path[0], (9, 0))
+    assert path[-1] == (9, 0) and pursuit.searches == 2, "Search should be rebuilt once the target is far from the anchor"
+
+
+def test_background_warm_up(monkeypatch):
+    monkeypatch.setattr('library.pathfinder.GRID_X_SIZE', 10)
+    monkeypatch.setattr('library.pathfinder.GRID_Y_SIZE', 10)
+    monkeypatch.setattr('library.pathfinder.CLUSTER_SIZE', 2)
+    monkeypatch.setattr('library.pathfinder.PATHFINDING_MODE', 'hpa')
+
+    ready = []
+    pathfinder = Pathfinder(set(), background=True, on_ready=ready.append)
+
+    assert pathfinder.ready.wait(5), "Warm-up should complete in the background"
+    assert ready == [pathfinder] and pathfinder.warmup_time is not None, "Readiness should be reported"
+    assert pathfinder.create_path((0, 0), (9, 9))[-1] == (9, 9), "Full-quality routing should be used once ready"
+
+
+def test_degraded_path(monkeypatch, pathfinder):
+    monkeypatch.setattr('library.pathfinder.WARMUP_NODE_BUDGET', 3)
+    pathfinder.ready.clear()
+
+    path = pathfinder.create_path((0, 0), (9, 9))
+    assert path and path[-1] != (9, 9), "Budgeted search should return a partial path"
+    assert path[-1] == (2, 2), "Partial path should lead towards the goal"
+    assert pathfinder.degraded_paths == 1, "Degraded paths should be counted"
+
+
+@pytest.mark.asyncio
+async def test_create_path_async(monkeypatch, pathfinder):
+    monkeypatch.setattr('library.pathfinder.PATHFINDING_EXECUTOR', 'thread')
+    monkeypatch.setattr('library.pathfinder.PATHFINDING_MODE', 'simple')
+    searches = []
+    create_path = pathfinder.create_path
+
+    def slow_path(*args):
+        searches.append(args)
+        time.sleep(0.1)
+        return create_path(*args)
+
+    monkeypatch.setattr(pathfinder, 'create_path', slow_path)
+
+    first = pathfinder.create_path_async((7, 7), (9, 9))
+    second = pathfinder.create_path_async((7, 7), (9, 9))
+    dead = pathfinder.create_path_async((7, 7), (9, 9), cancelled=lambda: True)
+    other = pathfinder.create_path_async((0, 0), (2, 0))
+
+    paths = await asyncio.gather(first, second, dead, other)
+    pathfinder.shutdown()
+
+    assert paths[0] == paths[1] == [(8, 8), (9, 9)], "Identical requests should get the same path"
+    assert paths[0] is not paths[1], "Coalesced requests should get their own copies"
+    assert paths[2] is None, "Cancelled request should resolve to None"
+    assert paths[3] == [(1, 0), (2, 0)], "Different requests should be searched separately"
+    assert len(searches) == 2, "Identical requests should share a single search"
+
+
+@pytest.mark.asyncio
+async def test_create_path_async_cancelled(monkeypatch, pathfinder):
+    monkeypatch.setattr('library.pathfinder.PATHFINDING_EXECUTOR', 'thread')
+    monkeypatch.setattr('library.pathfinder.PATHFINDING_WORKERS', 1)
+    monkeypatch.setattr('library.pathfinder.PATHFINDING_MODE', 'simple')
+    searches = []
+    monkeypatch.setattr(pathfinder, 'create_path', lambda *args: searches.append(args) or time.sleep(0.1) or [])
+
+    alive = [True]
+    busy = pathfinder.create_path_async((0, 0), (1, 0))
+    queued = pathfinder.create_path_async((0, 0), (2, 0), cancelled=lambda: not alive[0])
+    alive[0] = False
+
+    assert await queued is None, "Request of a dead squad should resolve to None"
+    assert await busy == [], "Running search should complete"
+    pathfinder.shutdown()
+    assert len(searches) == 1, "Cancelled request should never be searched"
+
+
+@pytest.mark.asyncio
+async def test_create_path_sliced(monkeypatch, pathfinder):
+    monkeypatch.setattr('library.pathfinder.PATHFINDING_EXECUTOR', 'sliced')
+    monkeypatch.setattr('library.pathfinder.PATHFINDING_MODE', 'diagonal-astar')
+    monkeypatch.setattr('library.pathfinder.PATHFINDING_TICK_BUDGET', 4)
+    monkeypatch.setattr('library.pathfinder.PATHFINDING_SLICE', 2)
+    done = []
+
+    long = pathfinder.create_path_async((0, 0), (9, 9), {(5, 5), (6, 6), (8, 8)})
+    short = pathfinder.create_path_async((3, 3), (4, 5))
+    long.add_done_callback(lambda _: done.append("long"))
+    short.add_done_callback(lambda _: done.append("short"))
+
+    await asyncio.sleep(0)
+    assert not long.done(), "Long search should be spread over several event loop iterations"
+
+    await asyncio.gather(long, short)
+    assert done == ["short", "long"], "Shorter request should complete first"
+    assert await long == pathfinder.create_8way_astar_path((0, 0), (9, 9), {(5, 5), (6, 6), (8, 8)}), \
+        "Sliced search should find the same path"
+
+
+def test_auto_path(monkeypatch, pathfinder):
+    monkeypatch.setattr('library.pathfinder.PATHFINDING_MODE', 'auto')
+    monkeypatch.setattr('library.pathfinder.AUTO_LOCAL_DISTANCE', 2)
+    stats = pathfinder.strategy_stats
+
+    assert pathfinder.create_path((0, 0), (2, 2)) == [(1, 1), (2, 2)], "Clear straight line should be used as is"
+    assert stats["direct"]["calls"] == 1, "Straight line should be counted"
+
+    path = pathfinder.create_path((0, 0), (2, 2), {(1, 1)})
+    assert len(path) == 3 and (1, 1) not in path, "Short blocked trip should be searched around the obstacle"
+    assert stats["local"]["calls"] == 1 and stats["local"]["nodes"], "Local search and its work should be counted"
+
+    path = pathfinder.create_path((0, 0), (9, 9), {(5, 5), (6, 6), (8, 8)})
+    assert path[-1] == (9, 9) and not {(5, 5), (6, 6), (8, 8)} & set(path), "Long trip should be found"
+    assert stats["hpa"]["calls"] == 1 and stats["hpa"]["squares"] == len(path), "Long trip should use HPA*"
@@ -0,0 +1,57 @@
+import pytest
+
+from library import MapGrid, Squad, Actor, EventRecorder, EventReplayer
+from library.tasks import move_to
+
+
+@pytest.mark.asyncio
+async def test_record_and_replay(tmp_path, monkeypatch):
+    monkeypatch.setattr('config.TRAVEL_DURATION', 0)
+    path = tmp_path / "run.rec"
+
+    grid = MapGrid()
+    recorder = EventRecorder(str(path), seed=7)
+    grid.add_listener(recorder)
+
+    grid.spawn("stalker", (1, 1))
+    grid.spawn("monolith", (5, 5))
+    squad = grid.get_grid()[(1, 1)][0][0]
+
+    await move_to(grid, squad, (2, 2))
+    grid.kill(squad, squad.actors[0])
+    grid.emit("task", squad, "IdleTask")
+
+    recorder.close()
+
+    replayer = EventReplayer(str(path))
+    assert replayer.metadata["seed"] == 7, "Recording should store the seed"
+
+    replayed = MapGrid()
+    count = replayer.replay(replayed)
+    assert count == 7, "Spawns, move, death, corpse, task name and task should be recorded"
+
+    copy = replayed.get_grid()[(2, 2)][0][0]
+    assert copy.sid == squad.sid, "Replayed squad should keep its SID"
+    assert copy.num_actors() == squad.num_actors(), "Replayed squad should lose actors"
+    assert len(replayed.get_grid()[(2, 2)][1]) == 1, "Corpse should be placed"
+    assert replayed.get_grid()[(5, 5)][0][0].faction == "monolith", "Other squads should be placed"
+
+
+def test_recorder_merges_moves(tmp_path):
+    path = tmp_path / "run.rec"
+
+    grid = MapGrid()
+    recorder = EventRecorder(str(path))
+    grid.add_listener(recorder)
+
+    squad = Squad("stalker", (0, 0))
+    squad.add_actor(Actor("stalker", (0, 0)))
+    grid.place(squad, (0, 0))
+    grid.remove(squad)
+    squad.location = (0, 1)
+    grid.place(squad, (0, 1))
+    grid.remove(squad)
+    recorder.close()
+
+    kinds = [kind for _, kind, _ in EventReplayer(str(path)).events()]
+    assert len(kinds) == 3, "Remove followed by a place should be stored as a single move"
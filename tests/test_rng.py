@@ -0,0 +1,37 @@
+import random
+
+import pytest
+
+from library import rng, Actor, Squad
+
+
+@pytest.fixture
+def seeded():
+    rng.seed(42)
+    yield
+    rng.seed(None)
+
+
+def test_unseeded_streams():
+    rng.seed(None)
+    assert rng.get_rng("tasks") is random, "Unseeded runs should use the global random module"
+
+
+def test_seeded_streams(seeded):
+    first = [rng.get_rng("combat").random() for _ in range(5)]
+    rng.get_rng("tasks").random()  # other subsystems should not affect the stream
+
+    rng.seed(42)
+    rng.get_rng("spawn").random()
+    second = [rng.get_rng("combat").random() for _ in range(5)]
+
+    assert first == second, "Same seed should produce the same stream"
+    assert rng.get_rng("combat") is not rng.get_rng("tasks"), "Every subsystem should get its own stream"
+
+
+def test_seeded_entities(seeded):
+    squad, actor = Squad("stalker", (0, 0)), Actor("stalker", (0, 0))
+
+    rng.seed(42)
+    assert Squad("stalker", (0, 0)).sid == squad.sid, "Squad ids should be reproducible"
+    assert Actor("stalker", (0, 0)).experience == actor.experience, "Actor stats should be reproducible"
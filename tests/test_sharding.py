@@ -0,0 +1,69 @@
+import asyncio
+import queue
+
+import pytest
+
+from library import MapGrid, Squad, Actor, Partition, Shard, Region
+from library.tasks import move_to
+
+
+def test_partition():
+    partition = Partition(2, 2)
+
+    assert len(partition.regions) == 4, "Grid should be split into 4 regions"
+    for region in partition.regions:
+        assert region.x_min % 10 == 0 and region.y_min % 10 == 0, "Region borders should be aligned with clusters"
+
+    assert partition.region_of((0, 0)).rid == 0, "Upper left square should belong to the first region"
+    assert partition.region_of((99, 84)).rid == 3, "Lower right square should belong to the last region"
+    assert sorted(partition.neighbors(0)) == [1, 2, 3], "All other regions should be neighbors in a 2x2 partition"
+
+    covered = sum((r.x_max - r.x_min) * (r.y_max - r.y_min) for r in partition.regions)
+    assert covered == 100 * 85, "Regions should cover the whole grid"
+
+
+def test_region_border():
+    region = Region(0, 0, 0, 50, 40)
+
+    assert region.is_near_border((48, 10), 5), "Square should be close to the inner border"
+    assert not region.is_near_border((0, 0), 5), "Grid edges should not count as region borders"
+    assert not region.is_near_border((20, 20), 5), "Square should not be close to any border"
+
+
+@pytest.mark.asyncio
+async def test_squad_handoff(monkeypatch):
+    monkeypatch.setattr('config.TRAVEL_DURATION', 0)
+
+    outbox = queue.Queue()
+    grid = MapGrid()
+    grid.shard = Shard(Region(0, 0, 0, 50, 85), outbox)
+
+    squad = Squad("stalker", (49, 5))
+    squad.add_actor(Actor("stalker", (49, 5)))
+    grid.place(squad, (49, 5))
+
+    assert not await move_to(grid, squad, (50, 5), ("move", (60, 5))), "Movement should stop at the region border"
+    assert (49, 5) not in grid.get_grid(), "Squad should leave the source region"
+
+    message = outbox.get_nowait()
+    assert message[0] == "handoff" and message[1] == (50, 5), "Squad should be sent to the region owning the square"
+
+    receiver = MapGrid()
+    receiver.shard = Shard(Region(1, 50, 0, 100, 85), queue.Queue())
+    receiver.shard.receive(asyncio.get_running_loop(), receiver, message)
+
+    received = receiver.get_grid()[(50, 5)][0][0]
+    assert received.sid == squad.sid, "Squad should be placed in the receiving region"
+    assert receiver.find_squad(squad.sid) is received, "Squad should be indexed by the receiving region"
+
+
+def test_border_squads():
+    grid = MapGrid()
+    grid.shard = Shard(Region(0, 0, 0, 50, 85), queue.Queue())
+    grid.shard.update_ghosts(1, [("abc", "monolith", (52, 5), 2)])
+
+    target = grid.get_squad_in_vicinity((48, 5), ["monolith"])
+    assert target and target.sid == "abc", "Squads from neighboring regions should be visible to hunters"
+
+    grid.shard.update_ghosts(1, [("abc", "monolith", (53, 5), 2)])
+    assert target.location == (53, 5), "Border squad copies should be updated in place"
@@ -0,0 +1,77 @@
+import asyncio
+import json
+import struct
+
+import pytest
+
+from library import MapGrid, Squad, Actor, StreamServer
+from library.recorder import SPAWN, MOVE, CORPSE, DEATH
+from library.streaming import META, SNAPSHOT, DELTA, LOG, _Client, decode_records, read_frame
+
+
+async def _records(reader):
+    kind, payload = await asyncio.wait_for(read_frame(reader), 1)
+    return kind, [(record_type, fields) for _, record_type, fields in decode_records(payload)]
+
+
+@pytest.mark.asyncio
+async def test_stream_server():
+    grid = MapGrid()
+    grid.spawn("stalker", (1, 1))
+    server = StreamServer(grid, port=0)
+    await server.start()
+
+    reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+    kind, payload = await read_frame(reader)
+    assert kind == META and json.loads(payload)["factions"], "Clients should get run metadata first"
+
+    kind, records = await _records(reader)
+    assert kind == SNAPSHOT and [r[0] for r in records] == [SPAWN], "Snapshot should contain squads already on the grid"
+    squad_id = records[0][1][0]
+
+    squad = grid.get_grid()[(1, 1)][0][0]
+    grid.move(squad, (1, 1), (2, 1))
+    grid.kill(squad, squad.actors[0])
+    kind, records = await _records(reader)
+    assert kind == DELTA, "Updates should be sent as deltas"
+    assert (MOVE, (squad_id, 2, 1)) in records, "Moves should be streamed"
+    assert DEATH in [r[0] for r in records] and CORPSE in [r[0] for r in records], "Deaths and corpses should be streamed"
+
+    # subscribe to a region away from the squad
+    subscription = json.dumps({"regions": [[50, 50, 60, 60]]}).encode()
+    writer.write(struct.pack("<IB", len(subscription), 0) + subscription)
+    kind, records = await _records(reader)
+    assert kind == SNAPSHOT and not records, "Subscribing should resend a snapshot of the region"
+
+    grid.move(squad, (2, 1), (3, 1))
+    grid.add_log_msg("INFO", "Hello")
+    grid.spawn("bandit", (55, 55))
+    kind, records = await _records(reader)
+    assert [r[0] for r in records] == [LOG, SPAWN, LOG], "Only updates inside the region and global logs should be streamed"
+    assert records[0][1] == ("INFO", None, "Hello"), "Log messages should be decoded"
+
+    writer.close()
+    await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_stream_server_backpressure():
+    grid = MapGrid()
+    server = StreamServer(grid, queue_size=2)
+    grid.add_listener(server)
+
+    # client that never reads
+    client = _Client(None, 2)
+    server._clients.append(client)
+
+    for i in range(5):
+        grid.spawn("stalker", (i, 1))
+        await asyncio.sleep(0)
+
+    assert client.resyncs, "Slow client should be resynced instead of queueing updates"
+    assert client.queue.qsize() <= 2, "Client queue should stay bounded"
+
+    frames = [client.queue.get_nowait() for _ in range(client.queue.qsize())]
+    kind, payload = frames[0][4], frames[0][5:]
+    assert kind == SNAPSHOT, "Backlog should be replaced with a snapshot"
+    assert len([r for r in decode_records(payload) if r[1] == SPAWN]) >= 3, "Snapshot should reflect the current grid"
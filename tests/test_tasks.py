@@ -48,7 +48,7 @@ async def test_move_task(monkeypatch):
 
     await MoveTask(grid, squad, (5, 5)).execute()
 
-    assert not grid.get_grid()[(1, 1)][0], "Squad should be removed from the original square"
+    assert (1, 1) not in grid.get_grid(), "Squad should be removed from the original square"
     assert squad.location == (5, 5), "Squad should move to expected location"
     assert squad.actors[0].location == (5, 5), "Squad actors should move to expected location"
     assert squad.has_task is False, "Squad should mark task as complete"
@@ -129,7 +129,7 @@ async def test_loot_task(monkeypatch):
     assert lootable.loot_value is None, "Actor should be marked as looted"
     assert squad.actors[0].loot_value == (prev_actor_value + lootable_value), "Actor's loot value should increase"
 
-    assert len(grid.get_grid()[(1, 1)][1]) == 0, "Looted actor should be removed from the grid"
+    assert (1, 1) not in grid.get_grid(), "Looted actor should be removed from the grid"
 
 
 @pytest.mark.asyncio